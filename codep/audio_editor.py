@@ -1,15 +1,350 @@
+import io
+import mmap
+import struct
+import subprocess
+import wave
+
+import soundfile as sf
 from pydub import AudioSegment
+from pydub.exceptions import CouldntDecodeError
+
+WAVE_FORMAT_PCM = 0x0001
+WAVE_FORMAT_EXTENSIBLE = 0xFFFE
+
+
+def read_pcm_wav_header(fileobj):
+    """
+    Walks the RIFF chunks of a WAV file and returns
+    (channels, sample_width, frame_rate, data_offset, data_size),
+    or None when the file is not 16/32-bit integer PCM.
+
+    fileobj does not have to be seekable, so the header of a WAV stream on a
+    pipe can be read too; it is left positioned at the first sample.
+    """
+    header = fileobj.read(12)
+    if len(header) < 12 or header[:4] != b"RIFF" or header[8:12] != b"WAVE":
+        return None
+    fmt = None
+    offset = 12
+    while True:
+        chunk = fileobj.read(8)
+        if len(chunk) < 8:
+            return None
+        offset += 8
+        chunk_id, size = struct.unpack("<4sI", chunk)
+        if chunk_id == b"fmt ":
+            body = fileobj.read(size + size % 2)
+            offset += len(body)
+            tag, channels, frame_rate, _, _, bits = struct.unpack("<HHIIHH", body[:16])
+            if tag == WAVE_FORMAT_EXTENSIBLE and size >= 26:
+                tag = struct.unpack("<H", body[24:26])[0]
+            if tag != WAVE_FORMAT_PCM or bits not in (16, 32):
+                return None
+            fmt = (channels, bits // 8, frame_rate)
+        elif chunk_id == b"data":
+            if fmt is None:
+                return None
+            return fmt + (offset, size)
+        elif fileobj.seekable():
+            fileobj.seek(size + size % 2, 1)
+            offset += size + size % 2
+        else:
+            offset += len(fileobj.read(size + size % 2))
+
+
+def write_segments(segments, output_path, frame_rate=None, channels=None, sample_width=None, crossfade_ms=0):
+    """
+    Writes an iterable of AudioSegments one after another into a WAV file.
+
+    Each segment is converted to the given frame_rate / channels /
+    sample_width (defaults to the first segment's format) and written as soon
+    as it arrives, so only one segment needs to be in memory at a time. With
+    crossfade_ms > 0 the tail of each segment is held back and blended into
+    the head of the next one.
+
+    Returns the number of frames written.
+    """
+    writer = None
+    tail = None
+    frames_written = 0
+    try:
+        for segment in segments:
+            if writer is None:
+                frame_rate = frame_rate or segment.frame_rate
+                channels = channels or segment.channels
+                sample_width = sample_width or segment.sample_width
+                writer = wave.open(output_path, "wb")
+                writer.setnchannels(channels)
+                writer.setsampwidth(sample_width)
+                writer.setframerate(frame_rate)
+            segment = segment.set_frame_rate(frame_rate).set_channels(channels).set_sample_width(sample_width)
+
+            if tail is not None:
+                fade = min(crossfade_ms, len(tail), len(segment))
+                segment = tail.append(segment, crossfade=fade) if fade > 0 else tail + segment
+            if crossfade_ms > 0:
+                # keep the end of this segment back so the next one can fade into it
+                split = max(len(segment) - crossfade_ms, 0)
+                segment, tail = segment[:split], segment[split:]
+
+            writer.writeframes(segment.raw_data)
+            frames_written += int(segment.frame_count())
+            del segment
+
+        if tail is not None and writer is not None:
+            writer.writeframes(tail.raw_data)
+            frames_written += int(tail.frame_count())
+    finally:
+        if writer is not None:
+            writer.close()
+    return frames_written
+
+
+def read_soundfile_frames(f, start, end):
+    """
+    Reads frames [start, end) of an open soundfile.SoundFile into an
+    AudioSegment, as 32-bit PCM for high-resolution subtypes, else 16-bit.
+    """
+    sample_width = 4 if f.subtype in ("PCM_24", "PCM_32", "FLOAT", "DOUBLE") else 2
+    f.seek(start)
+    data = f.read(max(end - start, 0), dtype="int%d" % (sample_width * 8), always_2d=True)
+    return AudioSegment(data=data.tobytes(), sample_width=sample_width, frame_rate=f.samplerate,
+                        channels=f.channels)
+
 
 class AudioEditor:
-    def _init_(self, file_path):
-        self.audio = AudioSegment.from_file(file_path)
+    def __init__(self, file_path=None):
+        # Nothing is decoded up front: PCM WAVs are memory-mapped so trim()
+        # only touches the requested frames, other formats are decoded lazily.
+        self.file_path = file_path
+        self._audio = None
+        self._file = None
+        self._map = None
+        self._wav_info = None
+        if file_path is not None:
+            self._open_wav()
+
+    def _open_wav(self):
+        f = open(self.file_path, "rb")
+        info = read_pcm_wav_header(f)
+        if info is None:
+            f.close()
+            return
+        channels, sample_width, frame_rate, offset, size = info
+        self._file = f
+        self._map = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        # streamed WAVs often carry a placeholder data size
+        size = min(size, len(self._map) - offset)
+        frame_size = channels * sample_width
+        self._wav_info = (channels, sample_width, frame_rate, offset, size // frame_size)
+
+    @property
+    def audio(self):
+        if self._audio is None:
+            self._audio = AudioSegment.from_file(self.file_path)
+        return self._audio
+
+    def close(self):
+        """Releases the memory map and file handle of a mapped WAV."""
+        if self._map is not None:
+            self._map.close()
+            self._file.close()
+            self._map = self._file = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
 
     def trim(self, start_ms, end_ms):
+        if self._audio is not None:
+            return self._audio[start_ms:end_ms]
+        if self._map is not None:
+            return self._trim_mapped(start_ms, end_ms)
+        if start_ms is not None and start_ms >= 0 and end_ms is not None and end_ms >= start_ms:
+            # seek in the input (libsndfile where the format allows it, else
+            # ffmpeg input seeking) so only the requested range is decoded
+            clip = self._trim_soundfile(start_ms, end_ms)
+            if clip is None:
+                clip = self._trim_ffmpeg(start_ms, end_ms)
+            return clip
         return self.audio[start_ms:end_ms]
 
+    def _trim_soundfile(self, start_ms, end_ms):
+        try:
+            f = sf.SoundFile(self.file_path)
+        except RuntimeError:
+            return None
+        with f:
+            if not f.seekable():
+                return None
+            to_frame = lambda ms: min(int(round(ms * f.samplerate / 1000.0)), f.frames)
+            return read_soundfile_frames(f, to_frame(start_ms), to_frame(end_ms))
+
+    def _ffmpeg_command(self, start_ms=None, end_ms=None):
+        command = [AudioSegment.converter, "-v", "error"]
+        # -ss / -t go before -i so ffmpeg seeks in the input instead of
+        # decoding everything up to start_ms and throwing it away
+        if start_ms:
+            command += ["-ss", "%.3f" % (start_ms / 1000.0)]
+        if end_ms is not None:
+            command += ["-t", "%.3f" % ((end_ms - (start_ms or 0)) / 1000.0)]
+        return command + ["-i", self.file_path, "-vn", "-map_metadata", "-1", "-fflags", "+bitexact",
+                          "-acodec", "pcm_s16le", "-f", "wav", "-"]
+
+    def _trim_ffmpeg(self, start_ms, end_ms):
+        p = subprocess.run(self._ffmpeg_command(start_ms, end_ms), stdout=subprocess.PIPE, stderr=subprocess.PIPE)
+        info = read_pcm_wav_header(io.BytesIO(p.stdout)) if p.returncode == 0 else None
+        if info is None:
+            raise CouldntDecodeError("Decoding failed. ffmpeg returned error code: {0}\n\n{1}".format(
+                p.returncode, p.stderr.decode(errors="ignore")))
+        channels, sample_width, frame_rate, offset, _ = info
+        return AudioSegment(data=p.stdout[offset:], sample_width=sample_width, frame_rate=frame_rate,
+                            channels=channels)
+
+    def _trim_mapped(self, start_ms, end_ms):
+        channels, sample_width, frame_rate, offset, n_frames = self._wav_info
+        to_frame = lambda ms: None if ms is None else int(round(ms * frame_rate / 1000.0))
+        start, end, _ = slice(to_frame(start_ms), to_frame(end_ms)).indices(n_frames)
+        end = max(start, end)
+        frame_size = channels * sample_width
+        data = self._map[offset + start * frame_size:offset + end * frame_size]
+        return AudioSegment(data=data, sample_width=sample_width, frame_rate=frame_rate, channels=channels)
+
     def concat(self, audio_paths):
         combined = AudioSegment.empty()
         for path in audio_paths:
             segment = AudioSegment.from_file(path)
             combined += segment
-        return combined
\ No newline at end of file
+        return combined
+
+    def concat_to_file(self, audio_paths, output_path, frame_rate=None, channels=None,
+                       sample_width=None, crossfade_ms=0):
+        """
+        Streams the inputs one after another into a WAV file at output_path.
+
+        Only one input is decoded at a time and its PCM goes straight to the
+        wave writer, so memory is bounded by the largest input instead of the
+        combined length. See write_segments for the format and crossfade options.
+        """
+        segments = (AudioSegment.from_file(path) for path in audio_paths)
+        return write_segments(segments, output_path, frame_rate, channels, sample_width, crossfade_ms)
+
+    @staticmethod
+    def render_edit_list(edits, output_path, frame_rate=None, channels=None,
+                         sample_width=None, crossfade_ms=0):
+        """
+        Renders an edit decision list into a single WAV file at output_path.
+
+        edits is a list of (source, start_ms, end_ms, gain_db) operations that
+        are joined in list order. Each source is opened once. Clips from
+        memory-mapped WAVs are sliced only when write_segments reaches them,
+        so they cost no memory up front; only the clips of compressed sources
+        are read ahead, in file order through read_ranges, so each of those
+        is decoded in a single pass.
+        """
+        editors = {}
+        pending = {}
+        try:
+            for source, start_ms, end_ms, gain_db in edits:
+                if source not in editors:
+                    editors[source] = AudioEditor(source)
+                if editors[source]._map is None:
+                    pending.setdefault(source, []).append((start_ms, end_ms))
+
+            decoded = {}
+            for source, ranges in pending.items():
+                ranges = sorted(set(ranges), key=lambda r: (r[0] or 0, r[1] if r[1] is not None else float("inf")))
+                decoded[source] = dict(zip(ranges, editors[source].read_ranges(ranges)))
+
+            def clips():
+                for source, start_ms, end_ms, gain_db in edits:
+                    if source in decoded:
+                        clip = decoded[source][(start_ms, end_ms)]
+                    else:
+                        clip = editors[source].trim(start_ms, end_ms)
+                    yield clip.apply_gain(gain_db) if gain_db else clip
+
+            return write_segments(clips(), output_path, frame_rate, channels, sample_width, crossfade_ms)
+        finally:
+            for editor in editors.values():
+                editor.close()
+
+    def read_ranges(self, ranges):
+        """
+        Yields the clip for every (start_ms, end_ms, ...) entry of ranges.
+
+        Memory-mapped WAVs are sliced directly. Other formats are read in one
+        sequential pass over the file: through soundfile, seeking over the
+        gaps, where libsndfile can open the format, else out of a single
+        ffmpeg stream that only keeps the audio a pending range still needs.
+        Ranges with a missing or negative bound are cut from the fully
+        decoded audio. Pass ranges sorted by start; a clip that finishes
+        before an earlier entry of ranges is held until that one is yielded.
+        """
+        ranges = list(ranges)
+        if self._map is not None or self._audio is not None:
+            for r in ranges:
+                yield self.trim(r[0], r[1])
+            return
+
+        bounded = [i for i, (start_ms, end_ms, *_) in enumerate(ranges)
+                   if start_ms is not None and start_ms >= 0 and end_ms is not None and end_ms >= start_ms]
+        order = sorted(bounded, key=lambda i: ranges[i][0])
+        stream = self._stream_ranges([ranges[i][:2] for i in order]) if order else iter(())
+        done = {}
+        streamed = iter(order)
+        bounded = set(bounded)
+        for i, r in enumerate(ranges):
+            if i not in bounded:
+                yield self.trim(r[0], r[1])
+                continue
+            while i not in done:
+                done[next(streamed)] = next(stream)
+            yield done.pop(i)
+
+    def _stream_ranges(self, spans):
+        # spans are (start_ms, end_ms) sorted by start
+        try:
+            f = sf.SoundFile(self.file_path)
+        except RuntimeError:
+            f = None
+        if f is not None:
+            with f:
+                if f.seekable():
+                    to_frame = lambda ms: min(int(round(ms * f.samplerate / 1000.0)), f.frames)
+                    for start_ms, end_ms in spans:
+                        yield read_soundfile_frames(f, to_frame(start_ms), to_frame(end_ms))
+                    return
+
+        first = spans[0][0]
+        command = self._ffmpeg_command(first, max(end_ms for _, end_ms in spans))
+        with subprocess.Popen(command, stdout=subprocess.PIPE, stderr=subprocess.PIPE) as p:
+            info = read_pcm_wav_header(p.stdout)
+            if info is None:
+                _, err = p.communicate()
+                raise CouldntDecodeError("Decoding failed. ffmpeg returned error code: {0}\n\n{1}".format(
+                    p.returncode, err.decode(errors="ignore")))
+            channels, sample_width, frame_rate, _, _ = info
+            frame_size = channels * sample_width
+            to_frame = lambda ms: int(round((ms - first) * frame_rate / 1000.0))
+            # buf holds the decoded frames from buf_start on; everything before
+            # the current span's start is dropped since later spans start later
+            buf = bytearray()
+            buf_start = 0
+            eof = False
+            for start_ms, end_ms in spans:
+                start, end = to_frame(start_ms), to_frame(end_ms)
+                while True:
+                    drop = min(max(start - buf_start, 0), len(buf) // frame_size)
+                    del buf[:drop * frame_size]
+                    buf_start += drop
+                    if eof or buf_start + len(buf) // frame_size >= end:
+                        break
+                    block = p.stdout.read(1 << 16)
+                    eof = not block
+                    buf += block
+                hi = max(min(end - buf_start, len(buf) // frame_size), 0) * frame_size
+                yield AudioSegment(data=bytes(buf[:hi]), sample_width=sample_width, frame_rate=frame_rate,
+                                   channels=channels)
@@ -5,13 +5,15 @@ from pydub.playback import play
 import noisereduce as nr
 from scipy.io import wavfile
 
+from resampler import resample_segment
+
 # Load the audio file
 class AudioLoader:
     def _init_(self, file_path):
         self.file_path = file_path
 
     def load(self):
-        audio = AudioSegment.from_file(self.file_path).set_channels(1).set_frame_rate(16000)
+        audio = resample_segment(AudioSegment.from_file(self.file_path).set_channels(1), 16000)
         print(f"Original Volume: {audio.dBFS:.2f} dBFS")
         return audio
 
@@ -7,6 +7,8 @@ import os
 import io # Needed for handling audio data from microphone if it were used with pipeline's raw input
 from transformers import pipeline, AutoFeatureExtractor, AutoModelForSequenceClassification
 
+from resampler import resample
+
 # --- Configuration ---
 # Define the pre-trained model to use for emotion detection
 MODEL_NAME = "ehcalabres/wav2vec2-lg-xlsr-en-speech-emotion-recognition"
@@ -55,7 +57,7 @@ def detect_emotion(audio_file_path):
         audio_data, current_sr = librosa.load(audio_file_path, sr=None, mono=True)
         if current_sr != TARGET_SAMPLE_RATE:
             print(f"Resampling audio from {current_sr}Hz to {TARGET_SAMPLE_RATE}Hz...")
-            audio_data = librosa.resample(audio_data, orig_sr=current_sr, target_sr=TARGET_SAMPLE_RATE)
+            audio_data = resample(audio_data, current_sr, TARGET_SAMPLE_RATE)
         
         # Prepare audio for the pipeline
         audio_for_pipeline = {
@@ -22,7 +22,20 @@ if __name__ == "_main_":
         for i in range(n):
             file_path = input(f"Enter path for audio file {i+1}: ")
             files.append(file_path)
-        editor = AudioEditor(files[0])
-        combined_audio = editor.concat(files)
-        combined_audio.export("E:\python\\results\output_concatenated.wav", format="wav")
-        print("Concatenated audio saved as 'output_concatenated.wav'")
\ No newline at end of file
+        editor = AudioEditor()
+        editor.concat_to_file(files, "E:\python\\results\output_concatenated.wav")
+        print("Concatenated audio saved as 'output_concatenated.wav'")
+
+    edl_choice = input("Do you want to apply an edit list (many trims and joins in one pass)? (yes/no): ")
+    if edl_choice.lower() == "yes":
+        n = int(input("How many edits? "))
+        edits = []
+        for i in range(n):
+            source = input(f"Edit {i+1} - source file path: ")
+            start = int(input(f"Edit {i+1} - start time in milliseconds: "))
+            end = int(input(f"Edit {i+1} - end time in milliseconds: "))
+            gain = float(input(f"Edit {i+1} - gain in dB (0 for none): ") or 0)
+            edits.append((source, start, end, gain))
+        editor = AudioEditor()
+        editor.render_edit_list(edits, "E:\python\\results\output_edited.wav")
+        print("Edited audio saved as 'output_edited.wav'")
\ No newline at end of file
@@ -1,74 +1,312 @@
 import librosa
 import numpy as np
 import soundfile as sf
+import soxr
 import argparse
+import itertools
+import multiprocessing
 import os
 
-# --- Command-Line Argument Parsing ---
-parser = argparse.ArgumentParser(description="Pitch Shift Audio File")
-parser.add_argument(
-    "-i", "--input_name",
-    type=str,
-    required=True,
-    help="Name of the input audio file (e.g., 'my_voice.wav'). Must be in data\\pitch_shifter_inputs\\"
-)
-parser.add_argument(
-    "-n", "--n_steps",
-    type=int,
-    default=5, # Default shift of 5 semitones
-    help="Number of semitones to shift the pitch. Positive for higher, negative for lower. Default is 5."
-)
-parser.add_argument(
-    "-o", "--output_name",
-    type=str,
-    default=None, # If not provided, a name will be generated
-    help="Optional: Name for the output pitch-shifted audio file (e.g., 'shifted_voice.wav'). If not provided, a name will be generated."
-)
-args = parser.parse_args()
-
-# --- Define Project Root and Paths ---
-# This script is in E:\New Volume\project\codep\
-# So, PROJECT_ROOT is E:\New Volume\project\
-project_root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
-
-# Construct the full path to the input audio file
-input_audio_dir = os.path.join(project_root, "data", "pitch_shifter_inputs")
-input_path = os.path.join(input_audio_dir, args.input_name)
-
-# Construct the output directory
-output_audio_dir = os.path.join(project_root, "results", "pitch_shifted_audio")
-os.makedirs(output_audio_dir, exist_ok=True) # Create the output folder if it doesn't exist
-
-# Determine the output file name
-if args.output_name:
-    output_filename = args.output_name
-else:
-    # Generate a default output name based on input and shift
+# STFT shared with pool workers by render_shifts, set once per worker process
+_shared_analysis = None
+
+
+def _stft_stream(blocks, n_fft, hop_length):
+    # librosa.stft(center=True, pad_mode="constant") one block of columns at a time
+    window = librosa.util.pad_center(librosa.filters.get_window("hann", n_fft, fftbins=True), size=n_fft)
+    window = window.reshape(-1, 1)
+    buf = np.zeros(n_fft // 2, dtype=np.float32)
+
+    def columns(buf):
+        n = (len(buf) - n_fft) // hop_length + 1 if len(buf) >= n_fft else 0
+        if n == 0:
+            return None, buf
+        frames = librosa.util.frame(buf, frame_length=n_fft, hop_length=hop_length)[:, :n]
+        return np.fft.rfft(window * frames, axis=0).astype(np.complex64), buf[n * hop_length:]
+
+    for block in blocks:
+        stft, buf = columns(np.concatenate([buf, block]))
+        if stft is not None:
+            yield stft
+    stft, _ = columns(np.concatenate([buf, np.zeros(n_fft // 2, dtype=np.float32)]))
+    if stft is not None:
+        yield stft
+
+
+def _phase_vocoder_stream(stfts, rate, n_frames, n_fft, hop_length):
+    # librosa.phase_vocoder over a stream of STFT blocks; only the two columns
+    # the next output step interpolates between are kept
+    phi_advance = hop_length * librosa.fft_frequencies(sr=2 * np.pi, n_fft=n_fft)
+    time_steps = np.arange(0, n_frames, rate)
+    phase_acc = None
+    D = None
+    base = 0
+    t = 0
+    for stft in itertools.chain(stfts, [None]):
+        if stft is None:
+            # same zero padding librosa adds past the last frame
+            stft = np.zeros((D.shape[0], 2), dtype=D.dtype)
+        if D is None:
+            D = stft
+            phase_acc = np.angle(D[:, 0])
+        else:
+            D = np.concatenate([D, stft], axis=1)
+        out = []
+        while t < len(time_steps) and int(time_steps[t]) + 2 - base <= D.shape[1]:
+            step = time_steps[t]
+            columns = D[:, int(step) - base:int(step + 2) - base]
+            alpha = np.mod(step, 1.0)
+            mag = (1.0 - alpha) * np.abs(columns[:, 0]) + alpha * np.abs(columns[:, 1])
+            out.append(librosa.util.phasor(phase_acc, mag=mag))
+            dphase = np.angle(columns[:, 1]) - np.angle(columns[:, 0]) - phi_advance
+            dphase = dphase - 2.0 * np.pi * np.round(dphase / (2.0 * np.pi))
+            phase_acc += phi_advance + dphase
+            t += 1
+        if out:
+            yield np.stack(out, axis=1).astype(D.dtype)
+        if t < len(time_steps):
+            drop = int(time_steps[t]) - base
+            D = D[:, drop:]
+            base += drop
+
+
+def _istft_stream(stfts, length, n_fft, hop_length):
+    # librosa.istft(center=True, length=length): overlap-add with the
+    # window-sum-square normalisation, emitting every sample no later frame
+    # can reach
+    window = librosa.filters.get_window("hann", n_fft, fftbins=True)
+    ifft_window = librosa.util.pad_center(window, size=n_fft).reshape(-1, 1)
+    win_sq = librosa.util.pad_center(window ** 2, size=n_fft)
+    tiny = librosa.util.tiny(np.float32(0))
+    pad = n_fft // 2
+    end = length + pad
+    n_frames = int(np.ceil((length + 2 * pad) / hop_length))
+    y = np.zeros(0, dtype=np.float32)
+    wss = np.zeros(0, dtype=np.float32)
+    base = pad
+    frame = 0
+
+    def emit(upto):
+        nonlocal y, wss, base
+        n = max(min(upto, end) - base, 0)
+        out, norm = y[:n].copy(), wss[:n]
+        nonzero = norm > tiny
+        out[nonzero] /= norm[nonzero]
+        y, wss, base = y[n:], wss[n:], base + n
+        return out
+
+    for stft in stfts:
+        stft = stft[:, :max(n_frames - frame, 0)]
+        ytmp = ifft_window * np.fft.irfft(stft, n=n_fft, axis=0)
+        grow = (frame + stft.shape[1] - 1) * hop_length + n_fft - base - len(y)
+        if grow > 0:
+            y = np.concatenate([y, np.zeros(grow, dtype=np.float32)])
+            wss = np.concatenate([wss, np.zeros(grow, dtype=np.float32)])
+        for j in range(stft.shape[1]):
+            sample = (frame + j) * hop_length - base
+            lo = max(-sample, 0)
+            y[sample + lo:sample + n_fft] += ytmp[lo:, j]
+            wss[sample + lo:sample + n_fft] += win_sq[lo:]
+        frame += stft.shape[1]
+        yield emit(frame * hop_length)
+    out = emit(end)
+    # istft pads with zeros when the frames run out before length
+    yield np.concatenate([out, np.zeros(end - base, dtype=np.float32)])
+
+
+def pitch_shift_blocks(blocks, sr, n_steps, length, n_fft=2048, hop_length=512):
+    """
+    Streaming librosa.effects.pitch_shift over an iterable of mono float32
+    blocks that add up to length samples, yielding the shifted signal in
+    pieces as soon as they are final.
+
+    The STFT, phase vocoder, inverse STFT and soxr resampler each carry
+    their state from one block to the next instead of restarting, so the
+    output is the whole-signal result whatever the block size, up to
+    float32 rounding, while memory stays at about one block.
+    """
+    rate = 2.0 ** (-float(n_steps) / 12)
+    stfts = _stft_stream(blocks, n_fft, hop_length)
+    stretched = _phase_vocoder_stream(stfts, rate, 1 + length // hop_length, n_fft, hop_length)
+    pieces = _istft_stream(stretched, int(round(length / rate)), n_fft, hop_length)
+    resampler = None if rate == 1 else soxr.ResampleStream(float(sr) / rate, sr, 1, dtype="float32", quality="soxr_hq")
+
+    remaining = length
+    for piece in itertools.chain(pieces, [None]):
+        if resampler is not None:
+            last = piece is None
+            piece = resampler.resample_chunk(np.zeros(0, dtype=np.float32) if last else piece, last=last)
+        elif piece is None:
+            continue
+        piece = piece[:remaining]
+        remaining -= len(piece)
+        if len(piece):
+            yield piece
+    # fix_length: pad with zeros to the input length
+    if remaining > 0:
+        yield np.zeros(remaining, dtype=np.float32)
+
+
+def pitch_shift_stream(input_path, output_path, n_steps, block_seconds=10.0):
+    """
+    Pitch-shifts input_path into output_path block by block with
+    pitch_shift_blocks, so only about one block is held in memory however
+    long the file is. The output matches librosa.effects.pitch_shift on the
+    whole down-mixed file.
+    """
+    with sf.SoundFile(input_path) as src:
+        sr = src.samplerate
+        total = src.frames
+        block = max(int(block_seconds * sr), 1)
+        # same down-mix librosa.load(mono=True) applies
+        blocks = (b.mean(axis=1) for b in src.blocks(block, dtype="float32", always_2d=True))
+
+        with sf.SoundFile(output_path, "w", samplerate=sr, channels=1) as dst:
+            for piece in pitch_shift_blocks(blocks, sr, n_steps, total):
+                dst.write(piece)
+    return sr
+
+
+def synthesize_shift(stft, length, sr, n_steps, hop_length=512):
+    """
+    Same steps as librosa.effects.pitch_shift (phase-vocoder time stretch,
+    then resampling back to the original duration), but starting from an
+    STFT that has already been computed.
+    """
+    rate = 2.0 ** (-float(n_steps) / 12)
+    stretched = librosa.phase_vocoder(stft, rate=rate, hop_length=hop_length)
+    y_stretch = librosa.istft(stretched, hop_length=hop_length, dtype=np.float32, length=int(round(length / rate)))
+    y_shift = librosa.resample(y_stretch, orig_sr=float(sr) / rate, target_sr=sr)
+    return librosa.util.fix_length(y_shift, size=length)
+
+
+def _init_shift_worker(stft, length, sr, hop_length):
+    global _shared_analysis
+    _shared_analysis = (stft, length, sr, hop_length)
+
+
+def _synthesize_shared(n_steps):
+    stft, length, sr, hop_length = _shared_analysis
+    return synthesize_shift(stft, length, sr, n_steps, hop_length=hop_length)
+
+
+def render_shifts(audio, sr, n_steps_list, workers=1, hop_length=512):
+    """
+    Renders audio at every shift in n_steps_list from a single STFT.
+
+    The analysis is computed once and handed to each worker process when the
+    pool starts, so every shift only pays for its own phase vocoder and
+    resampling. Returns the shifted signals in the order of n_steps_list.
+    """
+    stft = librosa.stft(audio, hop_length=hop_length)
+    workers = min(workers, len(n_steps_list))
+    if workers <= 1:
+        return [synthesize_shift(stft, len(audio), sr, n, hop_length=hop_length) for n in n_steps_list]
+    with multiprocessing.Pool(workers, initializer=_init_shift_worker,
+                              initargs=(stft, len(audio), sr, hop_length)) as pool:
+        return pool.map(_synthesize_shared, n_steps_list)
+
+
+def main():
+    # --- Command-Line Argument Parsing ---
+    parser = argparse.ArgumentParser(description="Pitch Shift Audio File")
+    parser.add_argument(
+        "-i", "--input_name",
+        type=str,
+        required=True,
+        help="Name of the input audio file (e.g., 'my_voice.wav'). Must be in data\\pitch_shifter_inputs\\"
+    )
+    parser.add_argument(
+        "-n", "--n_steps",
+        type=int,
+        nargs="+",
+        default=[5], # Default shift of 5 semitones
+        help="Number of semitones to shift the pitch. Positive for higher, negative for lower. Several values render one output per shift from a single analysis. Default is 5."
+    )
+    parser.add_argument(
+        "-w", "--workers",
+        type=int,
+        default=os.cpu_count() or 1,
+        help="Optional: Number of worker processes used when several shifts are rendered. Default is the CPU count."
+    )
+    parser.add_argument(
+        "-o", "--output_name",
+        type=str,
+        default=None, # If not provided, a name will be generated
+        help="Optional: Name for the output pitch-shifted audio file (e.g., 'shifted_voice.wav'). If not provided, a name will be generated."
+    )
+    parser.add_argument(
+        "-b", "--block_seconds",
+        type=float,
+        default=0, # 0 keeps the original whole-file path
+        help="Optional: Process the file in blocks of this many seconds and write the output incrementally, keeping memory constant for long files. Default 0 loads the whole file."
+    )
+    args = parser.parse_args()
+
+    # --- Define Project Root and Paths ---
+    # This script is in E:\New Volume\project\codep\
+    # So, PROJECT_ROOT is E:\New Volume\project\
+    project_root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+    # Construct the full path to the input audio file
+    input_audio_dir = os.path.join(project_root, "data", "pitch_shifter_inputs")
+    input_path = os.path.join(input_audio_dir, args.input_name)
+
+    # Construct the output directory
+    output_audio_dir = os.path.join(project_root, "results", "pitch_shifted_audio")
+    os.makedirs(output_audio_dir, exist_ok=True) # Create the output folder if it doesn't exist
+
+    # Determine the output file names, one per shift
     input_base_name = os.path.splitext(os.path.basename(args.input_name))[0]
-    output_filename = f"{input_base_name}_shifted_{args.n_steps}st.wav"
-
-output_path = os.path.join(output_audio_dir, output_filename)
-
-
-# === Load Input Audio ===
-try:
-    audio, sr = librosa.load(input_path, sr=None, mono=True)
-    print(f"✅ Successfully loaded audio from {input_path} with sample rate {sr}.")
-except Exception as e:
-    print(f"❌ Failed to load audio from {input_path}: {e}")
-    exit()
-
-# === Perform Pitch Shifting ===
-try:
-    pitch_shifted_audio = librosa.effects.pitch_shift(y=audio, sr=sr, n_steps=args.n_steps)
-    print(f"✅ Pitch shifting completed by {args.n_steps} semitones.")
-except Exception as e:
-    print(f"❌ Pitch shifting failed: {e}")
-    exit()
-
-# === Save Output ===
-try:
-    sf.write(output_path, pitch_shifted_audio, sr)
-    print(f"✅ Pitch shifting complete! Saved to {output_path}")
-except Exception as e:
-    print(f"❌ Failed to save output to {output_path}: {e}")
\ No newline at end of file
+    output_paths = []
+    for n_steps in args.n_steps:
+        if args.output_name and len(args.n_steps) == 1:
+            output_filename = args.output_name
+        elif args.output_name:
+            name, ext = os.path.splitext(args.output_name)
+            output_filename = f"{name}_{n_steps}st{ext or '.wav'}"
+        else:
+            # Generate a default output name based on input and shift
+            output_filename = f"{input_base_name}_shifted_{n_steps}st.wav"
+        output_paths.append(os.path.join(output_audio_dir, output_filename))
+
+    # === Streaming Path ===
+    if args.block_seconds > 0:
+        for n_steps, output_path in zip(args.n_steps, output_paths):
+            try:
+                pitch_shift_stream(input_path, output_path, n_steps, block_seconds=args.block_seconds)
+                print(f"✅ Pitch shifting complete! Saved to {output_path}")
+            except Exception as e:
+                print(f"❌ Streaming pitch shift of {input_path} failed: {e}")
+        return
+
+    # === Load Input Audio ===
+    try:
+        audio, sr = librosa.load(input_path, sr=None, mono=True)
+        print(f"✅ Successfully loaded audio from {input_path} with sample rate {sr}.")
+    except Exception as e:
+        print(f"❌ Failed to load audio from {input_path}: {e}")
+        exit()
+
+    # === Perform Pitch Shifting ===
+    try:
+        if len(args.n_steps) == 1:
+            shifted = [librosa.effects.pitch_shift(y=audio, sr=sr, n_steps=args.n_steps[0])]
+        else:
+            shifted = render_shifts(audio, sr, args.n_steps, workers=args.workers)
+        print(f"✅ Pitch shifting completed by {', '.join(str(n) for n in args.n_steps)} semitones.")
+    except Exception as e:
+        print(f"❌ Pitch shifting failed: {e}")
+        exit()
+
+    # === Save Output ===
+    for pitch_shifted_audio, output_path in zip(shifted, output_paths):
+        try:
+            sf.write(output_path, pitch_shifted_audio, sr)
+            print(f"✅ Pitch shifting complete! Saved to {output_path}")
+        except Exception as e:
+            print(f"❌ Failed to save output to {output_path}: {e}")
+
+
+if __name__ == "__main__":
+    main()
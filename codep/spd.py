@@ -16,6 +16,8 @@ except ImportError as e:
     print("Also ensure you have ffmpeg installed and in your system's PATH.")
     exit()
 
+from resampler import resample_segment
+
 # --- Command-Line Argument Parsing ---
 parser = argparse.ArgumentParser(description="Perform Speaker Diarization and Transcription on an Audio File")
 parser.add_argument(
@@ -78,7 +80,7 @@ if __name__ == "__main__":
         # Load audio using pydub
         print("Loading audio for transcription...")
         audio = AudioSegment.from_file(input_path) # Use from_file to handle various formats
-        audio = audio.set_frame_rate(16000) # Whisper requires 16000 Hz sample rate
+        audio = resample_segment(audio, 16000) # Whisper requires 16000 Hz sample rate
         print("Audio loaded and resampled to 16kHz.")
 
         # Load Whisper model
@@ -0,0 +1,44 @@
+import pytest
+
+np = pytest.importorskip("numpy")
+librosa = pytest.importorskip("librosa")
+sf = pytest.importorskip("soundfile")
+pytest.importorskip("soxr")
+
+from pitchchange import pitch_shift_blocks, pitch_shift_stream
+
+SR = 16000
+
+
+def make_signal(seconds=3.0, channels=1):
+    rng = np.random.default_rng(0)
+    t = np.arange(int(seconds * SR)) / SR
+    tone = 0.4 * np.sin(2 * np.pi * 220 * t * (1 + 0.1 * np.sin(3 * t)))
+    y = tone[:, None] + 0.05 * rng.standard_normal((len(t), channels))
+    return y.astype(np.float32)
+
+
+@pytest.mark.parametrize("n_steps", [5, -3, 0])
+@pytest.mark.parametrize("block", [37, 1000, 20000])
+def test_pitch_shift_blocks_matches_whole_signal(n_steps, block):
+    y = make_signal()[:, 0]
+    expected = librosa.effects.pitch_shift(y=y, sr=SR, n_steps=n_steps)
+    blocks = (y[i:i + block] for i in range(0, len(y), block))
+    shifted = np.concatenate(list(pitch_shift_blocks(blocks, SR, n_steps, len(y))))
+    assert shifted.shape == expected.shape
+    np.testing.assert_allclose(shifted, expected, rtol=0, atol=1e-6)
+
+
+def test_pitch_shift_stream_matches_whole_file(tmp_path):
+    input_path = str(tmp_path / "in.wav")
+    output_path = str(tmp_path / "out.wav")
+    sf.write(input_path, make_signal(channels=2), SR, subtype="FLOAT")
+
+    pitch_shift_stream(input_path, output_path, 4, block_seconds=0.25)
+
+    audio, sr = librosa.load(input_path, sr=None, mono=True)
+    expected = librosa.effects.pitch_shift(y=audio, sr=sr, n_steps=4)
+    shifted, _ = sf.read(output_path, dtype="float32")
+    assert shifted.shape == expected.shape
+    # the output file is 16-bit PCM, so allow one quantisation step
+    np.testing.assert_allclose(shifted, expected, rtol=0, atol=2.0 ** -15)
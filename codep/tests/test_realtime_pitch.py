@@ -0,0 +1,24 @@
+import pytest
+
+np = pytest.importorskip("numpy")
+pytest.importorskip("soundfile")
+
+from realtime_pitch import RealTimePitchShifter, measure_delay
+
+SR = 16000
+
+
+def test_unshifted_delay_is_half_the_window():
+    shifter = RealTimePitchShifter(SR, 0, frame_size=256, window_ms=30.0)
+    delays = measure_delay(SR, 0, frame_size=256, window_ms=30.0)
+    assert (delays == shifter.window // 2).all()
+
+
+@pytest.mark.parametrize("n_steps", [5, -5])
+def test_measured_delay_stays_within_the_bound(n_steps):
+    shifter = RealTimePitchShifter(SR, n_steps, frame_size=128, window_ms=20.0)
+    delays = measure_delay(SR, n_steps, frame_size=128, window_ms=20.0)
+    assert (delays >= 0).all()
+    assert (delays <= shifter.window).all()
+    # the sweep moves the taps, so the impulses come out at different delays
+    assert len(set(delays.tolist())) > 1
@@ -0,0 +1,25 @@
+import pytest
+
+np = pytest.importorskip("numpy")
+librosa = pytest.importorskip("librosa")
+pytest.importorskip("scipy")
+
+from resampler import resample
+
+
+@pytest.mark.parametrize("n, orig_sr, target_sr", [(88200, 44100, 48000), (44100 * 3, 44100, 16000),
+                                                   (12345, 32000, 44100), (5, 48000, 16000)])
+def test_resample_length_matches_librosa(n, orig_sr, target_sr):
+    wav = np.random.default_rng(0).standard_normal((2, n)).astype(np.float32)
+    expected = librosa.resample(wav, orig_sr=orig_sr, target_sr=target_sr)
+    out = resample(wav, orig_sr, target_sr)
+    assert out.shape == expected.shape
+    assert out.dtype == wav.dtype
+
+
+def test_resample_agrees_with_librosa_in_band():
+    t = np.arange(44100 * 2) / 44100
+    wav = (0.3 * np.sin(2 * np.pi * 220 * t) + 0.1 * np.sin(2 * np.pi * 3000 * t)).astype(np.float32)
+    expected = librosa.resample(wav, orig_sr=44100, target_sr=16000)[200:-200]
+    out = resample(wav, 44100, 16000)[200:-200]
+    assert np.sqrt(np.mean((out - expected) ** 2) / np.mean(expected ** 2)) < 1e-3
@@ -1,12 +1,12 @@
-import io
 import os
 
 # os.system("wget -P cvec/ https://huggingface.co/spaces/innnky/nanami/resolve/main/checkpoint_best_legacy_500.pt")
 import gradio as gr
 import librosa
 import numpy as np
-import soundfile
-from inference.infer_tool import Svc
+from model_registry import ModelRegistry
+from svc_array import slice_inference_array
+from warmup import warm_up
 import logging
 
 logging.getLogger('numba').setLevel(logging.WARNING)
@@ -15,30 +15,46 @@ logging.getLogger('urllib3').setLevel(logging.WARNING)
 logging.getLogger('matplotlib').setLevel(logging.WARNING)
 
 config_path = "configs/config.json"
+# 长音频按重叠窗口分段推理，显存/内存不随长度增长，这里只限制单次请求的处理时间
+max_seconds = 600
 
-model = Svc("logs/44k/G_114400.pth", "configs/config.json", cluster_model_path="logs/44k/kmeans_10000.pt")
+# configs/models.json按名字列出多个模型时可在页面上切换，按需加载，超过内存上限淘汰最久未使用的
+if os.path.exists("configs/models.json"):
+    registry = ModelRegistry.from_json("configs/models.json", 4 * 2 ** 30)
+else:
+    registry = ModelRegistry({"default": {"model_path": "logs/44k/G_114400.pth", "config_path": config_path,
+                                          "cluster_model_path": "logs/44k/kmeans_10000.pt"}}, 4 * 2 ** 30)
+model_names = registry.names()
+# 第一个模型常驻，不参与淘汰
+model = registry.pin(model_names[0])
+# 启动前预热，首个请求的延迟与之后一致
+warm_up(model)
 
 
+def model_fn(model_name):
+    spks = list(registry.get(model_name).spk2id.keys())
+    return gr.Dropdown.update(choices=spks, value=spks[0])
 
-def vc_fn(sid, input_audio, vc_transform, auto_f0,cluster_ratio, slice_db, noise_scale):
+
+
+def vc_fn(model_name, sid, input_audio, vc_transform, auto_f0,cluster_ratio, slice_db, noise_scale):
     if input_audio is None:
         return "You need to upload an audio", None
     sampling_rate, audio = input_audio
     # print(audio.shape,sampling_rate)
     duration = audio.shape[0] / sampling_rate
-    if duration > 90:
-        return "请上传小于90s的音频，需要转换长音频请本地进行转换", None
+    if duration > max_seconds:
+        return f"请上传小于{max_seconds}s的音频，需要转换更长的音频请本地进行转换", None
     audio = (audio / np.iinfo(audio.dtype).max).astype(np.float32)
     if len(audio.shape) > 1:
         audio = librosa.to_mono(audio.transpose(1, 0))
-    if sampling_rate != 16000:
-        audio = librosa.resample(audio, orig_sr=sampling_rate, target_sr=16000)
     print(audio.shape)
-    out_wav_path = "temp.wav"
-    soundfile.write(out_wav_path, audio, 16000, format="wav")
     print( cluster_ratio, auto_f0, noise_scale)
-    _audio = model.slice_inference(out_wav_path, sid, vc_transform, slice_db, cluster_ratio, auto_f0, noise_scale)
-    return "Success", (44100, _audio)
+    model = registry.get(model_name)
+    # 允许长达max_seconds的音频，长切片分窗推理以控制内存
+    _audio = slice_inference_array(model, audio, sampling_rate, sid, vc_transform, slice_db, cluster_ratio, auto_f0,
+                                   noise_scale, chunk_frames=1000)
+    return "Success", (model.target_sample, _audio)
 
 
 app = gr.Blocks()
@@ -50,9 +66,11 @@ with app:
                 
                 此demo为预训练底模在线demo，使用数据：云灏 即霜 辉宇·星AI 派蒙 绫地宁宁
                 """)
+            model_name = gr.Dropdown(label="模型", choices=model_names, value=model_names[0])
             spks = list(model.spk2id.keys())
             sid = gr.Dropdown(label="音色", choices=spks, value=spks[0])
-            vc_input3 = gr.Audio(label="上传音频（长度小于90秒）")
+            model_name.change(model_fn, [model_name], [sid])
+            vc_input3 = gr.Audio(label=f"上传音频（长度小于{max_seconds}秒）")
             vc_transform = gr.Number(label="变调（整数，可以正负，半音数量，升高八度就是12）", value=0)
             cluster_ratio = gr.Number(label="聚类模型混合比例，0-1之间，默认为0不启用聚类，能提升音色相似度，但会导致咬字下降（如果使用建议0.5左右）", value=0)
             auto_f0 = gr.Checkbox(label="自动f0预测，配合聚类模型f0预测效果更好,会导致变调功能失效（仅限转换语音，歌声不要勾选此项会究极跑调）", value=False)
@@ -61,7 +79,7 @@ with app:
             vc_submit = gr.Button("转换", variant="primary")
             vc_output1 = gr.Textbox(label="Output Message")
             vc_output2 = gr.Audio(label="Output Audio")
-        vc_submit.click(vc_fn, [sid, vc_input3, vc_transform,auto_f0,cluster_ratio, slice_db, noise_scale], [vc_output1, vc_output2])
+        vc_submit.click(vc_fn, [model_name, sid, vc_input3, vc_transform,auto_f0,cluster_ratio, slice_db, noise_scale], [vc_output1, vc_output2])
 
     app.launch()
 
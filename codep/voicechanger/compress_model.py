@@ -0,0 +1,59 @@
+import argparse
+import os
+import time
+
+import torch
+
+import utils
+from models import SynthesizerTrn
+
+
+def build_model(hps):
+    return SynthesizerTrn(
+        hps.data.filter_length // 2 + 1,
+        hps.train.segment_size // hps.data.hop_length,
+        **hps.model)
+
+
+def time_load(checkpoint_path, hps):
+    start = time.perf_counter()
+    model = build_model(hps)
+    utils.load_checkpoint(checkpoint_path, model, None)
+    return time.perf_counter() - start, model
+
+
+def main():
+    parser = argparse.ArgumentParser(description='export an inference-only sovits4 checkpoint')
+    parser.add_argument('-m', '--model_path', type=str, default="logs/44k/G_0.pth", help='训练得到的模型路径')
+    parser.add_argument('-c', '--config_path', type=str, default="configs/config.json", help='配置文件路径')
+    parser.add_argument('-o', '--output', type=str, default=None, help='输出路径，默认在模型文件名后加_infer')
+    args = parser.parse_args()
+
+    output = args.output or os.path.splitext(args.model_path)[0] + "_infer.pth"
+    hps = utils.get_hparams_from_file(args.config_path)
+    with torch.no_grad():
+        utils.save_inference_checkpoint(args.model_path, build_model(hps), output)
+
+        # 对比两种格式的文件大小和加载时间
+        full_time, full_model = time_load(args.model_path, hps)
+        infer_time, infer_model = time_load(output, hps)
+    print(f"{args.model_path}: {os.path.getsize(args.model_path) / 2 ** 20:.1f}MB, load {full_time:.2f}s")
+    print(f"{output}: {os.path.getsize(output) / 2 ** 20:.1f}MB, load {infer_time:.2f}s")
+
+    # 折叠weight norm后输出应与原模型一致
+    full_model.eval()
+    infer_model.eval()
+    c = torch.randn(1, hps.model.ssl_dim, 50)
+    f0 = torch.full((1, 50), 220.0)
+    uv = torch.ones(1, 50)
+    sid = torch.LongTensor([[0]])
+    with torch.no_grad():
+        torch.manual_seed(0)
+        a = full_model.infer(c, f0, uv, g=sid)
+        torch.manual_seed(0)
+        b = infer_model.infer(c, f0, uv, g=sid)
+    print(f"max abs difference of a test decode: {(a - b).abs().max().item():.2e}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,72 @@
+import torch
+from torch import nn
+from torchaudio.models import hubert_base
+
+FAIRSEQ_PATH = "hubert/checkpoint_best_legacy_500.pt"
+CONVERTED_PATH = "hubert/contentvec_legacy_500.pt"
+
+
+class ContentVec(nn.Module):
+    """
+    The ContentVec HuBERT on torchaudio's Wav2Vec2Model, without fairseq.
+
+    extract_features and final_proj mirror the fairseq HubertModel members
+    get_hubert_content uses, so the two are interchangeable there. The
+    module is plain torch and can be scripted, traced and exported to ONNX
+    (forward returns the final_proj units of output_layer).
+    """
+
+    def __init__(self, output_layer=9):
+        super().__init__()
+        self.model = hubert_base()
+        self.final_proj = nn.Linear(768, 256)
+        self.output_layer = output_layer
+
+    def extract_features(self, source, padding_mask=None, output_layer=None):
+        """fairseq-style: returns (features of output_layer, None); padding_mask marks padded samples."""
+        lengths = None
+        if padding_mask is not None and padding_mask.any():
+            lengths = (~padding_mask).sum(-1)
+        features, _ = self.model.extract_features(source, lengths, num_layers=output_layer or self.output_layer)
+        return features[-1], None
+
+    def forward(self, source):
+        return self.final_proj(self.extract_features(source)[0])
+
+
+def convert_contentvec(fairseq_path=FAIRSEQ_PATH, out_path=CONVERTED_PATH):
+    """One-off conversion of the fairseq checkpoint; this is the only place fairseq is needed."""
+    from fairseq import checkpoint_utils
+    from torchaudio.models.wav2vec2.utils import import_fairseq_model
+
+    models, _, _ = checkpoint_utils.load_model_ensemble_and_task([fairseq_path], suffix="")
+    original = models[0].eval()
+    model = ContentVec()
+    model.model.load_state_dict(import_fairseq_model(original).state_dict())
+    model.final_proj.load_state_dict(original.final_proj.state_dict())
+    torch.save(model.state_dict(), out_path)
+    return original, model.eval()
+
+
+def load_contentvec(path=CONVERTED_PATH):
+    model = ContentVec()
+    model.load_state_dict(torch.load(path, map_location="cpu"))
+    return model.eval()
+
+
+if __name__ == '__main__':
+    import argparse
+
+    parser = argparse.ArgumentParser(description='convert the fairseq ContentVec checkpoint for fairseq-free loading')
+    parser.add_argument('-i', '--input', type=str, default=FAIRSEQ_PATH, help='fairseq格式的ContentVec模型')
+    parser.add_argument('-o', '--output', type=str, default=CONVERTED_PATH, help='转换后的模型路径')
+    args = parser.parse_args()
+
+    original, converted = convert_contentvec(args.input, args.output)
+    # 转换后的第9层final_proj特征应与fairseq模型一致
+    import utils
+    wav = torch.randn(16000 * 3) * 0.1
+    with torch.no_grad():
+        expected = utils.get_hubert_content(original, wav)
+        actual = utils.get_hubert_content(converted, wav)
+    print(f"saved {args.output}, max abs difference to fairseq: {(expected - actual).abs().max().item():.2e}")
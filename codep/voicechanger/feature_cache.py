@@ -0,0 +1,160 @@
+import hashlib
+import os
+import tempfile
+import threading
+from collections import OrderedDict
+from contextlib import contextmanager
+
+try:
+    import fcntl
+except ImportError:  # Windows, where SvcWorkerPool cannot fork workers either
+    fcntl = None
+
+import numpy as np
+import torch
+
+
+class FeatureCache:
+    """
+    On-disk cache for content units and F0/uv, keyed by the audio content.
+
+    Entries are stored as one .pt file per key under cache_dir. The total
+    size is capped at max_bytes and the least recently used entries are
+    evicted first; recency survives restarts through the files' mtime.
+    Entries are written to a temporary file and renamed into place, so a
+    reader never sees a half-written entry and a crash leaves only a stray
+    .tmp file, which the next start removes. hits, misses and evictions are
+    counted so callers can report them.
+
+    Several processes (e.g. forked SvcWorkerPool workers) may share one
+    cache_dir: the index is rebuilt from disk under a file lock before every
+    eviction, so the directory as a whole stays within max_bytes, and lookups
+    go to disk, so an entry written by one process is a hit for the others.
+    """
+
+    def __init__(self, cache_dir="cache/features", max_bytes=1024 * 2 ** 20):
+        self.cache_dir = cache_dir
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.total_bytes = 0
+        self.index = OrderedDict()
+        self.lock = threading.Lock()
+        os.makedirs(cache_dir, exist_ok=True)
+        with self.lock, self._dir_lock():
+            for name in os.listdir(cache_dir):
+                if name.endswith(".tmp"):
+                    os.remove(os.path.join(cache_dir, name))
+            self._scan()
+            self._evict()
+
+    @staticmethod
+    def make_key(wav, sr, target_sr, hop_length, f0_method, encoder=""):
+        """encoder names the content encoder (see svc_array.content_encoder_id), whose units are cached."""
+        if isinstance(wav, torch.Tensor):
+            wav = wav.detach().cpu().numpy()
+        h = hashlib.sha1(np.ascontiguousarray(wav, dtype=np.float32).tobytes())
+        h.update(f"|{sr}|{target_sr}|{hop_length}|{f0_method}|{encoder}".encode())
+        return h.hexdigest()
+
+    def _path(self, key):
+        return os.path.join(self.cache_dir, key + ".pt")
+
+    @contextmanager
+    def _dir_lock(self):
+        # serialises index rebuilds and evictions across processes
+        if fcntl is None:
+            yield
+            return
+        with open(os.path.join(self.cache_dir, ".lock"), "a") as f:
+            fcntl.flock(f, fcntl.LOCK_EX)
+            yield
+
+    def _scan(self):
+        # mtimes are coarse, so entries touched within one tick keep the
+        # order this process saw them in; unknown entries count as newest
+        order = {key: i for i, key in enumerate(self.index)}
+        entries = []
+        for name in os.listdir(self.cache_dir):
+            if name.endswith(".pt"):
+                try:
+                    st = os.stat(os.path.join(self.cache_dir, name))
+                except OSError:
+                    # evicted by another process in the meantime
+                    continue
+                key = name[:-3]
+                entries.append((st.st_mtime, order.get(key, len(order)), key, st.st_size))
+        self.index = OrderedDict((key, size) for _, _, key, size in sorted(entries))
+        self.total_bytes = sum(self.index.values())
+
+    def refresh(self):
+        """Rebuilds the index from disk, e.g. after worker processes added entries."""
+        with self.lock, self._dir_lock():
+            self._scan()
+
+    def get(self, key, device="cpu"):
+        path = self._path(key)
+        try:
+            data = torch.load(path, map_location=device)
+            os.utime(path)
+        except (OSError, RuntimeError, EOFError):
+            with self.lock:
+                self.total_bytes -= self.index.pop(key, 0)
+                self.misses += 1
+            return None
+        with self.lock:
+            if key in self.index:
+                self.index.move_to_end(key)
+            self.hits += 1
+        return data["c"], data["f0"], data["uv"]
+
+    def put(self, key, feats):
+        c, f0, uv = feats
+        path = self._path(key)
+        fd, tmp_path = tempfile.mkstemp(suffix=".tmp", dir=self.cache_dir)
+        try:
+            with os.fdopen(fd, "wb") as f:
+                torch.save({"c": c.detach().cpu(), "f0": f0.detach().cpu(), "uv": uv.detach().cpu()}, f)
+            os.replace(tmp_path, path)
+        except BaseException:
+            os.remove(tmp_path)
+            raise
+        with self.lock, self._dir_lock():
+            self.index.pop(key, None)
+            self.index[key] = 0
+            # other processes may have added or evicted entries since the last scan
+            self._scan()
+            self._evict()
+
+    def _evict(self):
+        while self.total_bytes > self.max_bytes and len(self.index) > 1:
+            key, size = self.index.popitem(last=False)
+            self.total_bytes -= size
+            self.evictions += 1
+            try:
+                os.remove(self._path(key))
+            except OSError:
+                pass
+
+    def merge_counts(self, hits, misses, evictions):
+        """Adds the counts another process sharing cache_dir gathered to this cache's totals."""
+        with self.lock:
+            self.hits += hits
+            self.misses += misses
+            self.evictions += evictions
+
+    @property
+    def hit_rate(self):
+        lookups = self.hits + self.misses
+        return self.hits / lookups if lookups else 0.0
+
+    def stats(self):
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hit_rate,
+            "evictions": self.evictions,
+            "entries": len(self.index),
+            "bytes": self.total_bytes,
+        }
@@ -1,13 +1,20 @@
 import io
+import json
 import logging
+import os
+import threading
 
 import soundfile
 import torch
-import torchaudio
-from flask import Flask, request, send_file
+from flask import Flask, request, send_file, jsonify
 from flask_cors import CORS
 
-from inference.infer_tool import Svc, RealTimeVC
+from feature_cache import FeatureCache
+from micro_batch import DeadlineExceeded, MicroBatcher, QueueFull
+from model_registry import ModelRegistry
+from resampler import resample_tensor
+from warmup import WarmUp
+from svc_array import RealTimeVC, infer_array
 
 app = Flask(__name__)
 
@@ -25,21 +32,66 @@ def voice_change_model():
     # DAW所需的采样率
     daw_sample = int(float(request_form.get("sampleRate", 0)))
     speaker_id = int(float(request_form.get("sSpeakId", 0)))
-    # http获得wav文件并转换
-    input_wav_path = io.BytesIO(wave_file.read())
+    # 多模型时按名字选择模型，不填则用默认模型
+    model_name = request_form.get("sModelName") or default_model
+    try:
+        model = registry.get(model_name)
+    except KeyError:
+        return f"unknown model {model_name}", 404
+    # http获得wav文件，只解码一次，直接把数组交给模型
+    wav, wav_sr = soundfile.read(io.BytesIO(wave_file.read()), dtype="float32")
 
     # 模型推理
+    timings = None
     if raw_infer:
-        out_audio, out_sr = svc_model.infer(speaker_id, f_pitch_change, input_wav_path)
-        tar_audio = torchaudio.functional.resample(out_audio, svc_model.target_sample, daw_sample)
+        if batcher is not None:
+            # 短时间内到达的请求合并成一个batch推理
+            try:
+                out_audio, queue_wait, compute = batcher.submit(wav, wav_sr, speaker_id, f_pitch_change,
+                                                                svc_model=model).result()
+            except QueueFull:
+                return "inference queue is full", 503
+            except DeadlineExceeded:
+                return "request expired in inference queue", 504
+            timings = (queue_wait * 1000, compute * 1000)
+            print("queue wait:{:.1f}ms compute:{:.1f}ms".format(*timings))
+        else:
+            out_audio, out_sr = infer_array(model, speaker_id, f_pitch_change, wav, wav_sr,
+                                            feature_cache=feature_cache)
+        tar_audio = resample_tensor(out_audio, model.target_sample, daw_sample)
     else:
-        out_audio = svc.process(svc_model, speaker_id, f_pitch_change, input_wav_path)
-        tar_audio = torchaudio.functional.resample(torch.from_numpy(out_audio), svc_model.target_sample, daw_sample)
+        # RealTimeVC保存上一段音频做交叉淡化，每个模型各一个，多线程下需要串行
+        with svc_lock:
+            svc = realtime_vcs.setdefault(model_name, RealTimeVC())
+            out_audio = svc.process(model, speaker_id, f_pitch_change, wav, wav_sr)
+        tar_audio = resample_tensor(torch.from_numpy(out_audio), model.target_sample, daw_sample)
     # 返回音频
     out_wav_path = io.BytesIO()
     soundfile.write(out_wav_path, tar_audio.cpu().numpy(), daw_sample, format="wav")
     out_wav_path.seek(0)
-    return send_file(out_wav_path, download_name="temp.wav", as_attachment=True)
+    response = send_file(out_wav_path, download_name="temp.wav", as_attachment=True)
+    if timings is not None:
+        response.headers["X-Queue-Wait-Ms"] = "{:.1f}".format(timings[0])
+        response.headers["X-Compute-Ms"] = "{:.1f}".format(timings[1])
+    return response
+
+
+@app.route("/featureCacheStats", methods=["GET"])
+def feature_cache_stats():
+    return jsonify(feature_cache.stats())
+
+
+@app.route("/ready", methods=["GET"])
+def ready():
+    # 预热完成、延迟稳定后才返回200，负载均衡可据此开始转发请求；预热失败或未稳定时返回原因
+    if not warmup.ready():
+        return jsonify(warmup.status()), 503
+    return jsonify(warmup.status())
+
+
+@app.route("/modelStats", methods=["GET"])
+def model_stats():
+    return jsonify(registry.stats())
 
 
 if __name__ == '__main__':
@@ -50,7 +102,30 @@ if __name__ == '__main__':
     # 每个模型和config是唯一对应的
     model_name = "logs/32k/G_174000-Copy1.pth"
     config_name = "configs/config.json"
-    svc_model = Svc(model_name, config_name)
-    svc = RealTimeVC()
+    # 填写onnx_export.py导出的模型路径则用onnxruntime推理合成器
+    onnx_name = None
+    # 多模型服务：在configs/models.json里按名字列出模型路径和配置，请求带sModelName时按需加载，
+    # 超过内存上限时淘汰最久未使用的模型；不带sModelName时用default
+    models = {"default": {"model_path": model_name, "config_path": config_name, "onnx_path": onnx_name}}
+    if os.path.exists("configs/models.json"):
+        with open("configs/models.json", "r", encoding="utf-8") as f:
+            models.update(json.load(f))
+    registry = ModelRegistry(models, 4 * 2 ** 30)
+    default_model = "default"
+    # 默认模型被下面的batcher和warmup长期持有，固定常驻不参与淘汰
+    svc_model = registry.pin(default_model)
+    realtime_vcs = {}
+    # 相同音频重复转换时复用hubert内容特征和F0
+    feature_cache = FeatureCache("cache/features", 1024 * 2 ** 20)
+    svc_lock = threading.Lock()
+    # 多个客户端同时请求时，20ms窗口内到达的请求合并推理；队列满返回503，等待超过deadline返回504
+    # 设为False则逐个请求推理
+    micro_batch = True
+    batcher = None
+    if micro_batch:
+        batcher = MicroBatcher(svc_model, window_ms=20, max_batch=8, max_queue=32, deadline_ms=5000,
+                               feature_cache=feature_cache)
+    # 后台预热hubert、F0和合成器，首个请求不再承担初始化开销；trace=True时尝试trace解码器
+    warmup = WarmUp(svc_model, trace=False)
     # 此处与vst插件对应，不建议更改
-    app.run(port=6842, host="0.0.0.0", debug=False, threaded=False)
+    app.run(port=6842, host="0.0.0.0", debug=False, threaded=micro_batch)
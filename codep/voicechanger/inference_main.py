@@ -1,4 +1,3 @@
-import io
 import logging
 import time
 from pathlib import Path
@@ -11,11 +10,106 @@ import soundfile
 from inference import infer_tool
 from inference import slicer
 from inference.infer_tool import Svc
+from feature_cache import FeatureCache
+from precision import PRECISIONS, apply_precision
+from svc_array import extract_slice_features, synthesize_speakers
+from svc_batch import infer_slices
+from svc_pool import SvcWorkerPool
 
 logging.getLogger('numba').setLevel(logging.WARNING)
 chunks_dict = infer_tool.read_temp("inference/chunks_temp.json")
 
 
+def load_slices(clean_name, slice_db):
+    raw_audio_path = f"raw/{clean_name}"
+    if "." not in raw_audio_path:
+        raw_audio_path += ".wav"
+    infer_tool.format_wav(raw_audio_path)
+    wav_path = Path(raw_audio_path).with_suffix('.wav')
+    chunks = slicer.cut(wav_path, db_thresh=slice_db)
+    audio_data, audio_sr = slicer.chunks2audio(wav_path, chunks)
+    return wav_path, audio_data, audio_sr
+
+
+def result_path(clean_name, tran, spk, auto_predict_f0, cluster_infer_ratio, wav_format):
+    key = "auto" if auto_predict_f0 else f"{tran}key"
+    cluster_name = "" if cluster_infer_ratio == 0 else f"_{cluster_infer_ratio}"
+    return f'./results/{clean_name}_{key}_{spk}{cluster_name}.{wav_format}'
+
+
+def open_writers(svc_model, clean_name, tran, spk_list, auto_predict_f0, cluster_infer_ratio, wav_format):
+    # 每个说话人一个输出文件，切片推理完成后直接写入，不在内存里拼接整首
+    return [soundfile.SoundFile(result_path(clean_name, tran, spk, auto_predict_f0, cluster_infer_ratio, wav_format),
+                                "w", samplerate=svc_model.target_sample, channels=1, format=wav_format)
+            for spk in spk_list]
+
+
+def convert_parallel(svc_model, clean_names, trans, spk_list, slice_db, pad_seconds, cluster_infer_ratio,
+                     auto_predict_f0, noice_scale, wav_format, workers, worker_threads, feature_cache=None,
+                     chunk_frames=0):
+    # 所有文件的所有切片作为任务分给共享模型权重的子进程；同一文件的多个变调共用一个任务，特征只提取一次
+    files = []
+    slices_by_name = {}
+    for file_index, (clean_name, tran) in enumerate(zip(clean_names, trans)):
+        if clean_name not in slices_by_name:
+            _, audio_data, audio_sr = load_slices(clean_name, slice_db)
+            slices_by_name[clean_name] = (audio_data, audio_sr, [])
+        audio_data, audio_sr, file_indexes = slices_by_name[clean_name]
+        file_indexes.append(file_index)
+        files.append((clean_name, tran, audio_data, audio_sr))
+    items = []
+    for audio_data, audio_sr, file_indexes in slices_by_name.values():
+        for slice_index, (slice_tag, data) in enumerate(audio_data):
+            if not slice_tag:
+                items.append((data, audio_sr, [((i, slice_index), files[i][1]) for i in file_indexes]))
+
+    # 结果按完成顺序到达，按(文件, 切片)顺序写出，只暂存乱序到达的部分
+    writers = {}
+    next_slice = [0] * len(files)
+    pending = {}
+    finished = set()
+
+    def flush(file_index):
+        clean_name, tran, audio_data, audio_sr = files[file_index]
+        if file_index in finished:
+            return
+        if file_index not in writers:
+            writers[file_index] = open_writers(svc_model, clean_name, tran, spk_list, auto_predict_f0,
+                                               cluster_infer_ratio, wav_format)
+        while next_slice[file_index] < len(audio_data):
+            slice_index = next_slice[file_index]
+            slice_tag, data = audio_data[slice_index]
+            if slice_tag:
+                length = int(np.ceil(len(data) / audio_sr * svc_model.target_sample))
+                outs = [np.zeros(length, dtype=np.float32)] * len(spk_list)
+            elif (file_index, slice_index) in pending:
+                outs = pending.pop((file_index, slice_index))
+            else:
+                return
+            for writer, _audio in zip(writers[file_index], outs):
+                writer.write(_audio)
+            next_slice[file_index] += 1
+        for writer in writers.pop(file_index):
+            writer.close()
+        finished.add(file_index)
+
+    pool = SvcWorkerPool(svc_model, workers, worker_threads, feature_cache)
+    try:
+        for key, outs in pool.convert(items, spk_list, pad_seconds=pad_seconds,
+                                      cluster_infer_ratio=cluster_infer_ratio,
+                                      auto_predict_f0=auto_predict_f0,
+                                      noice_scale=noice_scale,
+                                      chunk_frames=chunk_frames):
+            pending[key] = outs
+            flush(key[0])
+        for file_index in range(len(files)):
+            flush(file_index)
+    finally:
+        pool.close()
+        for file_writers in writers.values():
+            for writer in file_writers:
+                writer.close()
+
 
 def main():
     import argparse
@@ -41,10 +135,27 @@ def main():
     parser.add_argument('-ns', '--noice_scale', type=float, default=0.4, help='噪音级别，会影响咬字和音质，较为玄学')
     parser.add_argument('-p', '--pad_seconds', type=float, default=0.5, help='推理音频pad秒数，由于未知原因开头结尾会有异响，pad一小段静音段后就不会出现')
     parser.add_argument('-wf', '--wav_format', type=str, default='flac', help='音频输出格式')
+    parser.add_argument('-fc', '--feature_cache_dir', type=str, default=None, help='内容特征/F0磁盘缓存目录，相同音频再次转换时跳过hubert和F0提取，不填则不缓存')
+    parser.add_argument('-fm', '--feature_cache_mb', type=float, default=1024, help='特征缓存大小上限(MB)，超出后按最近最少使用淘汰')
+    parser.add_argument('-w', '--workers', type=int, default=1, help='并行推理进程数，模型权重在进程间共享只读，大于1时需要fork(Linux/macOS)')
+    parser.add_argument('-wt', '--worker_threads', type=int, default=1, help='每个推理进程的torch线程数')
+    parser.add_argument('-pr', '--precision', type=str, default="fp32", choices=PRECISIONS, help='CPU推理精度，int8为动态量化，bf16需要CPU支持，用precision.py对比速度和音质')
+    parser.add_argument('-ox', '--onnx_path', type=str, default=None, help='onnx_export.py导出的模型，填写则用onnxruntime推理合成器，不支持自动预测音高和多进程')
+    parser.add_argument('-ot', '--onnx_threads', type=int, default=None, help='onnxruntime算子线程数，默认为CPU核数')
+    parser.add_argument('-bm', '--batch_mem_mb', type=float, default=0, help='批量推理的内存预算(MB)，多个切片补齐后一次前向，0则逐切片推理')
+    parser.add_argument('-cf', '--chunk_frames', type=int, default=0, help='超过此帧数的切片分窗推理，内存占用不随长度增长，0则整段推理')
 
     args = parser.parse_args()
+    if args.onnx_path and args.workers > 1:
+        parser.error("onnxruntime sessions cannot be shared with forked workers, use --workers 1")
+    if args.batch_mem_mb > 0 and args.workers > 1:
+        parser.error("--batch_mem_mb batches slices within one process, it cannot be combined with --workers > 1")
 
     svc_model = Svc(args.model_path, args.config_path, args.device, args.cluster_model_path)
+    apply_precision(svc_model, args.precision)
+    if args.onnx_path:
+        from onnx_infer import use_onnx_backend
+        use_onnx_backend(svc_model, args.onnx_path, args.onnx_threads)
     infer_tool.mkdir(["raw", "results"])
     clean_names = args.clean_names
     trans = args.trans
@@ -55,47 +166,69 @@ def main():
     cluster_infer_ratio = args.cluster_infer_ratio
     noice_scale = args.noice_scale
     pad_seconds = args.pad_seconds
+    batch_mem_mb = args.batch_mem_mb
+    feature_cache = None
+    if args.feature_cache_dir:
+        feature_cache = FeatureCache(args.feature_cache_dir, int(args.feature_cache_mb * 2 ** 20))
 
     infer_tool.fill_a_to_b(trans, clean_names)
-    for clean_name, tran in zip(clean_names, trans):
-        raw_audio_path = f"raw/{clean_name}"
-        if "." not in raw_audio_path:
-            raw_audio_path += ".wav"
-        infer_tool.format_wav(raw_audio_path)
-        wav_path = Path(raw_audio_path).with_suffix('.wav')
-        chunks = slicer.cut(wav_path, db_thresh=slice_db)
-        audio_data, audio_sr = slicer.chunks2audio(wav_path, chunks)
-
-        for spk in spk_list:
-            audio = []
-            for (slice_tag, data) in audio_data:
-                print(f'#=====segment start, {round(len(data) / audio_sr, 3)}s======')
+    if args.workers > 1:
+        convert_parallel(svc_model, clean_names, trans, spk_list, slice_db, pad_seconds, cluster_infer_ratio,
+                         auto_predict_f0, noice_scale, wav_format, args.workers, args.worker_threads,
+                         feature_cache, args.chunk_frames)
+        if feature_cache is not None:
+            print(f"feature cache: {feature_cache.stats()}")
+        return
+    # 每个文件的切片内容特征和F0只算一次，多个说话人/变调共用
+    slice_feats_by_file = {}
+    for index, (clean_name, tran) in enumerate(zip(clean_names, trans)):
+        wav_path, audio_data, audio_sr = load_slices(clean_name, slice_db)
+        if wav_path not in slice_feats_by_file:
+            slice_feats_by_file[wav_path] = extract_slice_features(svc_model, audio_data, audio_sr, pad_seconds,
+                                                               feature_cache)
+        slice_feats = slice_feats_by_file[wav_path]
+        if clean_name not in clean_names[index + 1:]:
+            del slice_feats_by_file[wav_path]
+
+        writers = open_writers(svc_model, clean_name, tran, spk_list, auto_predict_f0, cluster_infer_ratio,
+                               wav_format)
+        try:
+            if batch_mem_mb > 0:
+                for spk, writer in zip(spk_list, writers):
+                    for _audio in infer_slices(svc_model, audio_data, audio_sr, spk, tran, pad_seconds, batch_mem_mb,
+                                               cluster_infer_ratio=cluster_infer_ratio,
+                                               auto_predict_f0=auto_predict_f0,
+                                               noice_scale=noice_scale,
+                                               slice_feats=slice_feats,
+                                               chunk_frames=args.chunk_frames):
+                        writer.write(_audio)
+            else:
+                for (slice_tag, data), slice_feat in zip(audio_data, slice_feats):
+                    print(f'#=====segment start, {round(len(data) / audio_sr, 3)}s======')
+
+                    length = int(np.ceil(len(data) / audio_sr * svc_model.target_sample))
+                    if slice_tag:
+                        print('jump empty segment')
+                        _audios = [np.zeros(length, dtype=np.float32)] * len(spk_list)
+                    else:
+                        # 所有说话人在一次前向里合成
+                        out_audios = synthesize_speakers(svc_model, slice_feat, spk_list, tran,
+                                                         cluster_infer_ratio=cluster_infer_ratio,
+                                                         auto_predict_f0=auto_predict_f0,
+                                                         noice_scale=noice_scale,
+                                                         chunk_frames=args.chunk_frames
+                                                         )
+                        pad_len = int(svc_model.target_sample * pad_seconds)
+                        _audios = [out_audio.cpu().numpy()[pad_len:-pad_len] for out_audio in out_audios]
+
+                    for writer, _audio in zip(writers, _audios):
+                        writer.write(infer_tool.pad_array(_audio, length))
+        finally:
+            for writer in writers:
+                writer.close()
+    if feature_cache is not None:
+        print(f"feature cache: {feature_cache.stats()}")
 
-                length = int(np.ceil(len(data) / audio_sr * svc_model.target_sample))
-                if slice_tag:
-                    print('jump empty segment')
-                    _audio = np.zeros(length)
-                else:
-                    # padd
-                    pad_len = int(audio_sr * pad_seconds)
-                    data = np.concatenate([np.zeros([pad_len]), data, np.zeros([pad_len])])
-                    raw_path = io.BytesIO()
-                    soundfile.write(raw_path, data, audio_sr, format="wav")
-                    raw_path.seek(0)
-                    out_audio, out_sr = svc_model.infer(spk, tran, raw_path,
-                                                        cluster_infer_ratio=cluster_infer_ratio,
-                                                        auto_predict_f0=auto_predict_f0,
-                                                        noice_scale=noice_scale
-                                                        )
-                    _audio = out_audio.cpu().numpy()
-                    pad_len = int(svc_model.target_sample * pad_seconds)
-                    _audio = _audio[pad_len:-pad_len]
-
-                audio.extend(list(infer_tool.pad_array(_audio, length)))
-            key = "auto" if auto_predict_f0 else f"{tran}key"
-            cluster_name = "" if cluster_infer_ratio == 0 else f"_{cluster_infer_ratio}"
-            res_path = f'./results/{clean_name}_{key}_{spk}{cluster_name}.{wav_format}'
-            soundfile.write(res_path, audio, svc_model.target_sample, format=wav_format)
 
 if __name__ == '__main__':
     main()
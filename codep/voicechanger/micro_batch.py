@@ -0,0 +1,135 @@
+import queue
+import threading
+import time
+from concurrent.futures import Future
+
+from svc_array import apply_features, extract_features
+from svc_batch import infer_batch
+
+
+class DeadlineExceeded(Exception):
+    pass
+
+
+class QueueFull(Exception):
+    pass
+
+
+class _Request:
+    def __init__(self, svc_model, wav, sr, speaker, tran, deadline):
+        self.svc_model = svc_model
+        self.wav = wav
+        self.sr = sr
+        self.speaker = speaker
+        self.tran = tran
+        self.deadline = deadline
+        self.enqueued = time.monotonic()
+        self.future = Future()
+
+
+class MicroBatcher:
+    """
+    Groups concurrent conversion requests into batched synthesizer calls.
+
+    Requests are queued and a single worker thread collects everything that
+    arrives within window_ms of the first queued request (up to max_batch),
+    then runs one padded SynthesizerTrn forward for the whole group. The
+    queue holds at most max_queue requests; submit raises QueueFull beyond
+    that so the server can push back instead of piling up latency. Requests
+    still waiting when their deadline passes fail with DeadlineExceeded.
+    Each result carries the time spent queued and the time spent computing.
+    Requests may name their own Svc (e.g. from a ModelRegistry); requests
+    for different models in one window run as one batch per model. A request
+    whose features cannot be extracted fails on its own and the rest of its
+    batch still runs; a failing forward fails only that model's batch.
+    """
+
+    def __init__(self, svc_model, window_ms=20, max_batch=8, max_queue=32, deadline_ms=5000,
+                 feature_cache=None, auto_predict_f0=False, noice_scale=0.4):
+        self.svc_model = svc_model
+        self.window = window_ms / 1000.0
+        self.max_batch = max_batch
+        self.deadline = deadline_ms / 1000.0
+        self.feature_cache = feature_cache
+        self.auto_predict_f0 = auto_predict_f0
+        self.noice_scale = noice_scale
+        self.queue = queue.Queue(maxsize=max_queue)
+        self.thread = threading.Thread(target=self._run, daemon=True)
+        self.thread.start()
+
+    def submit(self, wav, sr, speaker, tran, deadline_ms=None, svc_model=None):
+        deadline = time.monotonic() + (self.deadline if deadline_ms is None else deadline_ms / 1000.0)
+        req = _Request(svc_model or self.svc_model, wav, sr, speaker, tran, deadline)
+        try:
+            self.queue.put_nowait(req)
+        except queue.Full:
+            raise QueueFull("%d requests already queued" % self.queue.maxsize)
+        return req.future
+
+    def _collect(self):
+        batch = [self.queue.get()]
+        end = time.monotonic() + self.window
+        while len(batch) < self.max_batch:
+            remaining = end - time.monotonic()
+            if remaining <= 0:
+                break
+            try:
+                batch.append(self.queue.get(timeout=remaining))
+            except queue.Empty:
+                break
+        return batch
+
+    def _run(self):
+        while True:
+            batch = self._collect()
+            try:
+                self._process(batch)
+            except Exception as e:
+                for req in batch:
+                    if not req.future.done():
+                        req.future.set_exception(e)
+
+    def _process(self, batch):
+        start = time.monotonic()
+        live = []
+        for req in batch:
+            if start > req.deadline:
+                req.future.set_exception(DeadlineExceeded("expired after %.0f ms in queue"
+                                                          % ((start - req.enqueued) * 1000)))
+            else:
+                live.append(req)
+        if not live:
+            return
+
+        groups = {}
+        for req in live:
+            groups.setdefault(id(req.svc_model), []).append(req)
+        for group in groups.values():
+            group_start = time.monotonic()
+            svc_model = group[0].svc_model
+            feats = []
+            ok = []
+            for req in group:
+                try:
+                    feats.append(apply_features(svc_model,
+                                                extract_features(svc_model, req.wav, req.sr, self.feature_cache),
+                                                req.tran, speaker=req.speaker))
+                except Exception as e:
+                    req.future.set_exception(e)
+                else:
+                    ok.append(req)
+            group = ok
+            if not group:
+                continue
+            try:
+                audios = infer_batch(svc_model, feats, [req.speaker for req in group],
+                                     auto_predict_f0=self.auto_predict_f0, noice_scale=self.noice_scale)
+            except Exception as e:
+                for req in group:
+                    req.future.set_exception(e)
+                continue
+            compute = time.monotonic() - group_start
+            for req, audio in zip(group, audios):
+                queue_wait = group_start - req.enqueued
+                req.future.set_result((audio, queue_wait, compute))
+            print("micro batch of {}: compute {:.1f} ms".format(len(group), compute * 1000))
@@ -0,0 +1,148 @@
+import json
+import os
+import threading
+import time
+from collections import OrderedDict
+
+import utils
+from inference.infer_tool import Svc
+from precision import apply_precision
+
+
+def model_bytes(model):
+    """Bytes held by a module's parameters and buffers."""
+    tensors = list(model.parameters()) + list(model.buffers())
+    return sum(t.numel() * t.element_size() for t in tensors)
+
+
+class ModelRegistry:
+    """
+    Loads Svc models by name on first use and keeps the recently used ones.
+
+    models maps a name to {"model_path", "config_path"} and optionally
+    "cluster_model_path" and "onnx_path" (run the synthesizer through
+    onnx_infer). Every loaded model is switched to precision. The
+    synthesizers kept resident are capped at max_bytes; the least recently
+    used ones are dropped first (the one just requested always stays).
+    Models loaded through pin() are never dropped, for callers that hold
+    on to one, such as a server's default model.
+
+    All models share one HuBERT, since so-vits-svc 4.0 models all use the
+    same ContentVec: once the first model is loaded, utils.get_hubert_model
+    hands its HuBERT to every later Svc, so they never load their own.
+    Loads hold a per-name lock, so a slow load only blocks requests for
+    that model; the registry-wide lock only guards the bookkeeping. hits,
+    misses, evictions and load times are counted for stats().
+    """
+
+    def __init__(self, models, max_bytes=4 * 2 ** 30, device=None, precision="fp32", onnx_threads=None):
+        self.models = models
+        self.max_bytes = max_bytes
+        self.device = device
+        self.precision = precision
+        self.onnx_threads = onnx_threads
+        self.loaded = OrderedDict()
+        self.sizes = {}
+        self.total_bytes = 0
+        self.hubert_model = None
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.load_seconds = {}
+        self.lock = threading.Lock()
+        self.load_locks = {}
+        self.pinned = set()
+
+    @classmethod
+    def from_json(cls, path, max_bytes=4 * 2 ** 30, device=None, precision="fp32", onnx_threads=None):
+        with open(path, "r", encoding="utf-8") as f:
+            return cls(json.load(f), max_bytes, device, precision, onnx_threads)
+
+    def names(self):
+        return list(self.models)
+
+    def _lookup(self, name):
+        if name in self.loaded:
+            self.loaded.move_to_end(name)
+            self.hits += 1
+            return self.loaded[name]
+        return None
+
+    def pin(self, name):
+        """Loads name like get() and exempts it from eviction."""
+        with self.lock:
+            self.pinned.add(name)
+        return self.get(name)
+
+    def get(self, name):
+        with self.lock:
+            svc_model = self._lookup(name)
+            if svc_model is not None:
+                return svc_model
+            if name not in self.models:
+                raise KeyError(f"unknown model {name}")
+            load_lock = self.load_locks.setdefault(name, threading.Lock())
+        with load_lock:
+            with self.lock:
+                # another request may have loaded it while this one waited
+                svc_model = self._lookup(name)
+                if svc_model is not None:
+                    return svc_model
+                self.misses += 1
+            start = time.perf_counter()
+            svc_model, size = self._load(self.models[name])
+            with self.lock:
+                self.load_seconds[name] = time.perf_counter() - start
+                self.sizes[name] = size
+                self.total_bytes += size
+                self.loaded[name] = svc_model
+                print(f"loaded model {name} in {self.load_seconds[name]:.2f}s ({size / 2 ** 20:.1f}MB)")
+                self._evict()
+            return svc_model
+
+    def _load(self, spec):
+        with self.lock:
+            shared = self.hubert_model
+        # os.path.exists("") is False, so Svc skips the cluster model when none is given
+        svc_model = Svc(spec["model_path"], spec["config_path"], self.device, spec.get("cluster_model_path") or "")
+        # the shared HuBERT already got the precision when its own model was loaded
+        apply_precision(svc_model, self.precision, hubert=shared is None)
+        if shared is None:
+            with self.lock:
+                if self.hubert_model is None:
+                    self.hubert_model = svc_model.hubert_model
+                    utils.shared_hubert_model = self.hubert_model
+                # a concurrent load may have published its HuBERT first
+                svc_model.hubert_model = self.hubert_model
+        if spec.get("onnx_path"):
+            from onnx_infer import use_onnx_backend
+            use_onnx_backend(svc_model, spec["onnx_path"], self.onnx_threads)
+            return svc_model, os.path.getsize(spec["onnx_path"])
+        return svc_model, model_bytes(svc_model.net_g_ms)
+
+    def _evict(self):
+        for name in list(self.loaded)[:-1]:
+            if self.total_bytes <= self.max_bytes:
+                break
+            if name in self.pinned:
+                continue
+            del self.loaded[name]
+            self.total_bytes -= self.sizes.pop(name)
+            self.evictions += 1
+            print(f"evicted model {name}")
+
+    @property
+    def hit_rate(self):
+        lookups = self.hits + self.misses
+        return self.hits / lookups if lookups else 0.0
+
+    def stats(self):
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hit_rate,
+            "evictions": self.evictions,
+            "resident": list(self.loaded),
+            "bytes": self.total_bytes,
+            "load_seconds": self.load_seconds,
+        }
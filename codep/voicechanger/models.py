@@ -14,6 +14,7 @@ from torch.nn.utils import weight_norm, remove_weight_norm, spectral_norm
 import utils
 from modules.commons import init_weights, get_padding
 from vdecoder.hifigan.models import Generator
+from streaming_decoder import StreamingDecoder, decoder_receptive_field
 from utils import f0_to_coarse
 
 class ResidualCouplingBlock(nn.Module):
@@ -402,8 +403,53 @@ class SynthesizerTrn(nn.Module):
 
     return o, ids_slice, spec_mask, (z, z_p, m_p, logs_p, m_q, logs_q), pred_lf0, norm_lf0, lf0
 
-  def infer(self, c, f0, uv, g=None, noice_scale=0.35, predict_f0=False):
-    c_lengths = (torch.ones(c.size(0)) * c.size(-1)).to(c.device)
+  def infer(self, c, f0, uv, g=None, noice_scale=0.35, predict_f0=False, c_lengths=None):
+    z, f0, g = self.infer_latent(c, f0, uv, g=g, noice_scale=noice_scale, predict_f0=predict_f0, c_lengths=c_lengths)
+    o = self.dec(z, g=g, f0=f0)
+    return o
+
+  def infer_chunked(self, c, f0, uv, g=None, noice_scale=0.35, predict_f0=False, c_lengths=None,
+                    chunk_frames=1000, overlap_frames=50, speakers=False):
+    """
+    infer (or with speakers, infer_speakers) for long inputs. The encoder,
+    flow and F0 decoder run over windows of chunk_frames with overlap_frames
+    of context on both sides; only the latents of each window's own
+    chunk_frames are kept, so neighbouring windows join at a frame boundary
+    rather than being crossfaded. The joined latents go through a
+    StreamingDecoder, which carries the NSF sine phase across windows, so
+    there is no phase mismatch (and no comb filtering) at the joins; the
+    decoder's own receptive field smooths the latent seam. Peak memory
+    depends on chunk_frames only and the runtime grows linearly with the
+    input instead of quadratically through the attention layers. With
+    predict_f0 the F0 is normalized per window rather than globally.
+    """
+    total = c.size(-1)
+    if total <= chunk_frames + 2 * overlap_frames:
+      if speakers:
+        return self.infer_speakers(c, f0, uv, g=g, noice_scale=noice_scale, predict_f0=predict_f0)
+      return self.infer(c, f0, uv, g=g, noice_scale=noice_scale, predict_f0=predict_f0, c_lengths=c_lengths)
+    infer_latent = self.infer_speakers_latent if speakers else self.infer_latent
+    decoder = self.streaming_decoder()
+    outs = []
+    for start in range(0, total, chunk_frames):
+      lo = max(start - overlap_frames, 0)
+      hi = min(start + chunk_frames + overlap_frames, total)
+      end = min(start + chunk_frames, total)
+      window_lengths = None if c_lengths is None else (c_lengths - lo).clamp(1, hi - lo)
+      z, f0_w, g_w = infer_latent(c[:, :, lo:hi], f0[:, lo:hi], uv[:, lo:hi], g=g, noice_scale=noice_scale,
+                                  predict_f0=predict_f0, c_lengths=window_lengths)
+      outs.append(decoder.push(z[:, :, start - lo:end - lo], f0_w[:, start - lo:end - lo], g_w))
+    outs.append(decoder.flush(g_w))
+    return torch.cat(outs, dim=2)
+
+  def infer_latent(self, c, f0, uv, g=None, noice_scale=0.35, predict_f0=False, c_lengths=None):
+    """
+    infer up to the decoder: returns (z, f0, g) as passed to self.dec, for
+    feeding a StreamingDecoder.
+    """
+    # c_lengths lets a padded batch of slices share one forward pass
+    if c_lengths is None:
+      c_lengths = (torch.ones(c.size(0)) * c.size(-1)).to(c.device)
     g = self.emb_g(g).transpose(1,2)
     x_mask = torch.unsqueeze(commons.sequence_mask(c_lengths, c.size(2)), 1).to(c.dtype)
     x = self.pre(c) * x_mask + self.emb_uv(uv.long()).transpose(1,2)
@@ -416,5 +462,43 @@ class SynthesizerTrn(nn.Module):
 
     z_p, m_p, logs_p, c_mask = self.enc_p(x, x_mask, f0=f0_to_coarse(f0), noice_scale=noice_scale)
     z = self.flow(z_p, c_mask, g=g, reverse=True)
-    o = self.dec(z * c_mask, g=g, f0=f0)
+    return z * c_mask, f0, g
+
+  def streaming_decoder(self, context_frames=None):
+    return StreamingDecoder(self.dec, context_frames)
+
+  def infer_speakers(self, c, f0, uv, g, noice_scale=0.35, predict_f0=False):
+    """
+    Renders one input (batch of 1) in every speaker of g at once.
+
+    pre and enc_p do not depend on the speaker, so they run once and only
+    flow and dec see the speakers, folded into the batch dimension. With
+    predict_f0 the F0 (and therefore enc_p's input) is speaker dependent, so
+    the speakers are folded in before the F0 decoder instead.
+    Returns [n_speakers, 1, samples].
+    """
+    z, f0, g = self.infer_speakers_latent(c, f0, uv, g, noice_scale=noice_scale, predict_f0=predict_f0)
+    o = self.dec(z, g=g, f0=f0)
     return o
+
+  def infer_speakers_latent(self, c, f0, uv, g, noice_scale=0.35, predict_f0=False, c_lengths=None):
+    """infer_speakers up to the decoder: returns (z, f0, g) with one batch row per speaker."""
+    n = g.numel()
+    if c_lengths is None:
+      c_lengths = (torch.ones(c.size(0)) * c.size(-1)).to(c.device)
+    g = self.emb_g(g.view(n, 1)).transpose(1,2)
+    x_mask = torch.unsqueeze(commons.sequence_mask(c_lengths, c.size(2)), 1).to(c.dtype)
+    x = self.pre(c) * x_mask + self.emb_uv(uv.long()).transpose(1,2)
+
+    if predict_f0:
+        x, x_mask, uv, f0 = x.repeat(n, 1, 1), x_mask.repeat(n, 1, 1), uv.repeat(n, 1), f0.repeat(n, 1)
+        lf0 = 2595. * torch.log10(1. + f0.unsqueeze(1) / 700.) / 500
+        norm_lf0 = utils.normalize_f0(lf0, x_mask, uv, random_scale=False)
+        pred_lf0 = self.f0_decoder(x, norm_lf0, x_mask, spk_emb=g)
+        f0 = (700 * (torch.pow(10, pred_lf0 * 500 / 2595) - 1)).squeeze(1)
+
+    z_p, m_p, logs_p, c_mask = self.enc_p(x, x_mask, f0=f0_to_coarse(f0), noice_scale=noice_scale)
+    if not predict_f0:
+        z_p, c_mask, f0 = z_p.repeat(n, 1, 1), c_mask.repeat(n, 1, 1), f0.repeat(n, 1)
+    z = self.flow(z_p, c_mask, g=g, reverse=True)
+    return z * c_mask, f0, g
@@ -1,35 +1,17 @@
 import torch
-from torchaudio.models.wav2vec2.utils import import_fairseq_model
-from fairseq import checkpoint_utils
+from contentvec import load_contentvec
 from onnxexport.model_onnx import SynthesizerTrn
 import utils
 
-def get_hubert_model():
-    vec_path = "hubert/checkpoint_best_legacy_500.pt"
-    print("load model(s) from {}".format(vec_path))
-    models, saved_cfg, task = checkpoint_utils.load_model_ensemble_and_task(
-        [vec_path],
-        suffix="",
-    )
-    model = models[0]
-    model.eval()
-    return model
-
 
 def main(HubertExport, NetExport):
     path = "SoVits4.0"
 
-    '''if HubertExport:
+    if HubertExport:
+        # 需要先运行contentvec.py把fairseq模型转换一次
         device = torch.device("cpu")
-        vec_path = "hubert/checkpoint_best_legacy_500.pt"
-        models, saved_cfg, task = checkpoint_utils.load_model_ensemble_and_task(
-            [vec_path],
-            suffix="",
-        )
-        original = models[0]
-        original.eval()
-        model = original
-        test_input = torch.rand(1, 1, 16000)
+        model = load_contentvec().to(device)
+        test_input = torch.rand(1, 16000)
         model(test_input)
         torch.onnx.export(model,
                           test_input,
@@ -42,10 +24,14 @@ def main(HubertExport, NetExport):
                           dynamic_axes={
                               'source':
                                   {
-                                      2: "sample_length"
+                                      1: "sample_length"
+                                  },
+                              'embed':
+                                  {
+                                      1: "frame_length"
                                   },
                           }
-                          )'''
+                          )
     if NetExport:
         device = torch.device("cpu")
         hps = utils.get_hparams_from_file(f"checkpoints/{path}/config.json")
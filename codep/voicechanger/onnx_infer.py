@@ -0,0 +1,183 @@
+import math
+import os
+import threading
+import time
+
+import numpy as np
+import onnxruntime as ort
+import torch
+
+from models import SynthesizerTrn
+
+
+class OnnxSynthesizer:
+    """
+    Runs the graph written by onnx_export.py in place of Svc.net_g_ms.
+
+    infer, infer_chunked and infer_speakers take and return the same tensors
+    as SynthesizerTrn, so either backend can be used; infer_chunked joins
+    its windows differently. The CPU session runs intra_op_threads threads
+    with all graph optimizations. Inputs and outputs are bound through an
+    IOBinding to buffers that only grow, so calls do not allocate per
+    tensor. The exported graph has no F0 predictor.
+    """
+
+    def __init__(self, onnx_path, hps, intra_op_threads=None, inter_op_threads=1):
+        options = ort.SessionOptions()
+        options.intra_op_num_threads = intra_op_threads or os.cpu_count()
+        options.inter_op_num_threads = inter_op_threads
+        options.execution_mode = ort.ExecutionMode.ORT_SEQUENTIAL
+        options.graph_optimization_level = ort.GraphOptimizationLevel.ORT_ENABLE_ALL
+        self.session = ort.InferenceSession(onnx_path, options, providers=["CPUExecutionProvider"])
+        self.binding = self.session.io_binding()
+        self.inter_channels = hps.model.inter_channels
+        self.upsample_rates = hps.model.upsample_rates
+        self.hop = int(np.prod(self.upsample_rates))
+        self.buffers = {}
+        self.lock = threading.Lock()
+
+    def _buffer(self, name, shape, dtype):
+        size = int(np.prod(shape))
+        buf = self.buffers.get(name)
+        if buf is None or buf.size < size:
+            buf = np.empty(max(size, 2 * (0 if buf is None else buf.size)), dtype=dtype)
+            self.buffers[name] = buf
+        return buf[:size].reshape(shape)
+
+    def _run(self, c, f0, uv, sid, noice_scale):
+        """c [frames, ssl_dim], f0/uv [frames] as NumPy; returns [samples] float32."""
+        frames = c.shape[0]
+        inputs = {
+            "c": self._buffer("c", (1, frames, c.shape[1]), np.float32),
+            "f0": self._buffer("f0", (1, frames), np.float32),
+            "mel2ph": self._buffer("mel2ph", (1, frames), np.int64),
+            "uv": self._buffer("uv", (1, frames), np.float32),
+            "noise": self._buffer("noise", (1, self.inter_channels, frames), np.float32),
+            "sid": self._buffer("sid", (1,), np.int64),
+        }
+        inputs["c"][0] = c
+        inputs["f0"][0] = f0
+        # row 0 of the graph's padded content is silence, frame i reads row i + 1
+        inputs["mel2ph"][0] = np.arange(1, frames + 1)
+        inputs["uv"][0] = uv
+        inputs["noise"][...] = np.random.standard_normal(inputs["noise"].shape) * noice_scale
+        inputs["sid"][0] = sid
+        audio = self._buffer("audio", (1, 1, frames * self.hop), np.float32)
+
+        self.binding.clear_binding_inputs()
+        self.binding.clear_binding_outputs()
+        for name, array in inputs.items():
+            self.binding.bind_input(name, "cpu", 0, array.dtype, array.shape, array.ctypes.data)
+        self.binding.bind_output("audio", "cpu", 0, audio.dtype, audio.shape, audio.ctypes.data)
+        self.session.run_with_iobinding(self.binding)
+        return audio[0, 0].copy()
+
+    def infer(self, c, f0, uv, g=None, noice_scale=0.35, predict_f0=False, c_lengths=None):
+        if predict_f0:
+            raise ValueError("the exported ONNX graph has no F0 predictor")
+        lengths = [c.size(-1)] * c.size(0) if c_lengths is None else [int(n) for n in c_lengths]
+        c = c.float().cpu().numpy()
+        f0 = f0.float().cpu().numpy()
+        uv = uv.float().cpu().numpy()
+        sids = g.view(-1).cpu().numpy()
+        o = torch.zeros(c.shape[0], 1, c.shape[-1] * self.hop)
+        with self.lock:
+            for i, n in enumerate(lengths):
+                audio = self._run(c[i, :, :n].T, f0[i, :n], uv[i, :n], sids[i], noice_scale)
+                o[i, 0, :len(audio)] = torch.from_numpy(audio)
+        return o
+
+    def infer_speakers(self, c, f0, uv, g, noice_scale=0.35, predict_f0=False):
+        return torch.cat([self.infer(c, f0, uv, g=sid.view(1, 1), noice_scale=noice_scale, predict_f0=predict_f0)
+                          for sid in g.view(-1)])
+
+    def infer_chunked(self, c, f0, uv, g=None, noice_scale=0.35, predict_f0=False, c_lengths=None,
+                      chunk_frames=1000, overlap_frames=50, speakers=False):
+        """
+        SynthesizerTrn.infer_chunked for the exported graph. The graph ends in
+        the decoder, so windows cannot be joined as latents with a continuous
+        NSF phase: each window is rendered to audio and neighbours are
+        crossfaded with sin^2/cos^2 gains over the overlap_frames they share.
+        The harmonic phases of two windows are unrelated, so voiced sounds
+        can dip briefly inside a crossfade; the crossfade is confined to
+        overlap_frames (about 0.6 s by default at 44.1 kHz), and a longer
+        chunk_frames means fewer joins.
+        """
+        if speakers:
+            return torch.cat([self.infer_chunked(c, f0, uv, g=sid.view(1, 1), noice_scale=noice_scale,
+                                                 predict_f0=predict_f0, chunk_frames=chunk_frames,
+                                                 overlap_frames=overlap_frames)
+                              for sid in g.view(-1)])
+        lengths = [c.size(-1)] * c.size(0) if c_lengths is None else [int(n) for n in c_lengths]
+        o = torch.zeros(c.size(0), 1, c.size(-1) * self.hop)
+        for i, n in enumerate(lengths):
+            audio = self._infer_windows(c[i:i + 1, :, :n], f0[i:i + 1, :n], uv[i:i + 1, :n], g[i:i + 1],
+                                        noice_scale, chunk_frames, overlap_frames)
+            o[i, :, :audio.size(-1)] = audio[0]
+        return o
+
+    def _infer_windows(self, c, f0, uv, g, noice_scale, chunk_frames, overlap_frames):
+        total = c.size(-1)
+        if total <= chunk_frames + 2 * overlap_frames:
+            return self.infer(c, f0, uv, g=g, noice_scale=noice_scale)
+        hop = self.hop
+        o = torch.zeros(1, 1, total * hop)
+        for start in range(0, total, chunk_frames):
+            lo = max(start - overlap_frames, 0)
+            hi = min(start + chunk_frames + overlap_frames, total)
+            seg = self.infer(c[:, :, lo:hi], f0[:, lo:hi], uv[:, lo:hi], g=g, noice_scale=noice_scale)
+            seg = seg[:, :, (start - lo) * hop:(hi - lo) * hop]
+            if start > 0:
+                n = (min(start + overlap_frames, total) - start) * hop
+                seg[:, :, :n] *= torch.sin(torch.linspace(0, math.pi / 2, n)) ** 2
+            if start + chunk_frames < total:
+                n = (hi - start - chunk_frames) * hop
+                seg[:, :, -n:] *= torch.cos(torch.linspace(0, math.pi / 2, n)) ** 2
+            o[:, :, start * hop:hi * hop] += seg
+        return o
+
+
+def use_onnx_backend(svc_model, onnx_path, intra_op_threads=None):
+    """Swaps svc_model's torch synthesizer for an OnnxSynthesizer."""
+    svc_model.net_g_ms = OnnxSynthesizer(onnx_path, svc_model.hps_ms, intra_op_threads)
+    return svc_model
+
+
+def benchmark(model_path, config_path, onnx_path, seconds=(1, 5, 10), repeats=5, intra_op_threads=None):
+    import utils
+
+    hps = utils.get_hparams_from_file(config_path)
+    net_g = SynthesizerTrn(hps.data.filter_length // 2 + 1, hps.train.segment_size // hps.data.hop_length,
+                           **hps.model)
+    utils.load_checkpoint(model_path, net_g, None)
+    net_g.eval()
+    onnx_g = OnnxSynthesizer(onnx_path, hps, intra_op_threads)
+    sid = torch.LongTensor([[0]])
+    for duration in seconds:
+        frames = int(duration * hps.data.sampling_rate / hps.data.hop_length)
+        c = torch.randn(1, hps.model.ssl_dim, frames)
+        f0 = torch.full((1, frames), 220.0)
+        uv = torch.ones(1, frames)
+        print(f"{duration}s ({frames} frames)")
+        for name, model in (("torch", net_g), ("onnxruntime", onnx_g)):
+            with torch.no_grad():
+                model.infer(c, f0, uv, g=sid)
+                start = time.perf_counter()
+                for _ in range(repeats):
+                    model.infer(c, f0, uv, g=sid)
+            elapsed = (time.perf_counter() - start) / repeats
+            print(f"  {name:12s} {elapsed * 1000:8.1f}ms  rtf {elapsed / duration:.3f}")
+
+
+if __name__ == '__main__':
+    import argparse
+
+    parser = argparse.ArgumentParser(description='compare the onnxruntime backend with the torch synthesizer')
+    parser.add_argument('-m', '--model_path', type=str, default="logs/44k/G_0.pth", help='模型路径')
+    parser.add_argument('-c', '--config_path', type=str, default="configs/config.json", help='配置文件路径')
+    parser.add_argument('-ox', '--onnx_path', type=str, default="checkpoints/SoVits4.0/model.onnx", help='onnx_export.py导出的模型')
+    parser.add_argument('-ot', '--onnx_threads', type=int, default=None, help='onnxruntime算子线程数，默认为CPU核数')
+    parser.add_argument('-r', '--repeats', type=int, default=5, help='每个长度计时的推理次数')
+    args = parser.parse_args()
+    benchmark(args.model_path, args.config_path, args.onnx_path, repeats=args.repeats,
+              intra_op_threads=args.onnx_threads)
@@ -0,0 +1,160 @@
+import functools
+import time
+
+import numpy as np
+import soundfile
+import torch
+from torch import nn
+
+PRECISIONS = ["fp32", "int8", "bf16"]
+
+
+class PointwiseLinear(nn.Module):
+    """
+    A kernel-size-1 Conv1d expressed as nn.Linear over the channel axis.
+
+    A weight-normed conv keeps a .weight that only its forward pre-hook
+    refreshes from weight_g/weight_v, and load_checkpoint restores only
+    those two, so the norm is folded in first rather than copying a stale
+    weight.
+    """
+
+    def __init__(self, conv):
+        super().__init__()
+        if hasattr(conv, "weight_g"):
+            nn.utils.remove_weight_norm(conv)
+        self.linear = nn.Linear(conv.in_channels, conv.out_channels, bias=conv.bias is not None)
+        self.linear.weight.data.copy_(conv.weight.detach()[:, :, 0])
+        if conv.bias is not None:
+            self.linear.bias.data.copy_(conv.bias.detach())
+
+    def forward(self, x):
+        return self.linear(x.transpose(1, 2)).transpose(1, 2)
+
+
+def pointwise_to_linear(module):
+    """
+    Replaces every 1x1 Conv1d below module with a PointwiseLinear.
+
+    Dynamic quantization only covers nn.Linear (and RNNs); the attention
+    projections and most conditioning layers of SynthesizerTrn are 1x1
+    convolutions, which this makes quantizable. Wider convolutions are left
+    in fp32.
+    """
+    for name, child in module.named_children():
+        if isinstance(child, nn.Conv1d) and child.kernel_size == (1,) and child.stride == (1,) \
+                and child.padding == (0,) and child.groups == 1:
+            setattr(module, name, PointwiseLinear(child))
+        else:
+            pointwise_to_linear(child)
+    return module
+
+
+def quantize_int8(model):
+    # in place: a deepcopy fails on the computed weights of weight-normed layers
+    return torch.quantization.quantize_dynamic(pointwise_to_linear(model), {nn.Linear}, dtype=torch.qint8,
+                                               inplace=True)
+
+
+def _to_float(out):
+    if isinstance(out, torch.Tensor):
+        return out.float()
+    if isinstance(out, tuple):
+        return tuple(_to_float(o) for o in out)
+    return out
+
+
+def autocast_bf16(fn):
+    """Runs fn under CPU bf16 autocast and hands fp32 tensors back to the caller."""
+    @functools.wraps(fn)
+    def wrapper(*args, **kwargs):
+        with torch.autocast("cpu", dtype=torch.bfloat16):
+            return _to_float(fn(*args, **kwargs))
+    return wrapper
+
+
+def apply_precision(svc_model, precision, hubert=True):
+    """
+    Switches an Svc's synthesizer and HuBERT to fp32, int8 or bf16 in place.
+
+    int8 is dynamic quantization: Linear weights (including the 1x1 convs
+    turned into Linear) are stored as int8 and activations are quantized on
+    the fly. bf16 runs the forward passes under CPU autocast; it is only
+    fast on CPUs with native bf16 support (AVX512-BF16 / AMX). hubert=False
+    leaves the HuBERT alone, for one shared by models already switched.
+    """
+    if precision == "fp32":
+        return svc_model
+    if precision == "int8":
+        svc_model.net_g_ms = quantize_int8(svc_model.net_g_ms)
+        if hubert:
+            svc_model.hubert_model = quantize_int8(svc_model.hubert_model)
+    elif precision == "bf16":
+        for name in ("infer", "infer_speakers", "infer_chunked"):
+            setattr(svc_model.net_g_ms, name, autocast_bf16(getattr(svc_model.net_g_ms, name)))
+        if hubert:
+            svc_model.hubert_model.extract_features = autocast_bf16(svc_model.hubert_model.extract_features)
+    else:
+        raise ValueError(f"unknown precision {precision}, expected one of {PRECISIONS}")
+    if hubert:
+        # the units change with the precision, so cached features must not be shared across them
+        svc_model.hubert_model.precision = precision
+    return svc_model
+
+
+def log_spectral_distance(reference, estimate, n_fft=2048, hop_length=512):
+    """Mean log-spectral distance (dB) between two signals of the same rate."""
+    length = min(len(reference), len(estimate))
+    window = torch.hann_window(n_fft)
+    specs = []
+    for audio in (reference, estimate):
+        audio = torch.as_tensor(np.asarray(audio[:length], dtype=np.float32))
+        spec = torch.stft(audio, n_fft, hop_length, window=window, return_complex=True).abs()
+        specs.append(20 * torch.log10(spec.clamp(min=1e-5)))
+    return torch.sqrt(((specs[0] - specs[1]) ** 2).mean(dim=0)).mean().item()
+
+
+def precision_report(model_path, config_path, wav_path, speaker, tran=0, precisions=PRECISIONS, repeats=3):
+    """
+    Converts wav_path in every precision and compares it with fp32.
+
+    Returns {precision: {"rtf": ..., "lsd_db": ...}}; rtf is compute time
+    over audio duration (below 1 is faster than real time), lsd_db the
+    log-spectral distance to the fp32 output. Every run uses the same seed so
+    the model's sampling noise does not count as a quality difference.
+    """
+    from inference.infer_tool import Svc
+    from svc_array import infer_array
+
+    wav, sr = soundfile.read(wav_path, dtype="float32")
+    duration = len(wav) / sr
+    outputs = {}
+    report = {}
+    for precision in ["fp32"] + [p for p in precisions if p != "fp32"]:
+        svc_model = apply_precision(Svc(model_path, config_path, device="cpu"), precision)
+        infer_array(svc_model, speaker, tran, wav, sr)
+        start = time.perf_counter()
+        for _ in range(repeats):
+            torch.manual_seed(0)
+            out_audio, _ = infer_array(svc_model, speaker, tran, wav, sr)
+        rtf = (time.perf_counter() - start) / repeats / duration
+        outputs[precision] = out_audio.cpu().numpy()
+        report[precision] = {"rtf": rtf, "lsd_db": log_spectral_distance(outputs["fp32"], outputs[precision])}
+        print(f"{precision}: rtf {rtf:.3f}, log-spectral distance to fp32 {report[precision]['lsd_db']:.2f} dB")
+    return report
+
+
+if __name__ == '__main__':
+    import argparse
+
+    parser = argparse.ArgumentParser(description='sovits4 precision report')
+    parser.add_argument('-m', '--model_path', type=str, default="logs/44k/G_0.pth", help='模型路径')
+    parser.add_argument('-c', '--config_path', type=str, default="configs/config.json", help='配置文件路径')
+    parser.add_argument('-i', '--input', type=str, required=True, help='测试用wav文件')
+    parser.add_argument('-s', '--speaker', type=str, default='nen', help='合成目标说话人名称')
+    parser.add_argument('-t', '--trans', type=int, default=0, help='音高调整，支持正负（半音）')
+    parser.add_argument('-p', '--precisions', type=str, nargs='+', default=PRECISIONS, choices=PRECISIONS, help='要比较的推理精度')
+    parser.add_argument('-r', '--repeats', type=int, default=3, help='每种精度计时的推理次数')
+    args = parser.parse_args()
+    precision_report(args.model_path, args.config_path, args.input, args.speaker, args.trans, args.precisions,
+                     args.repeats)
@@ -0,0 +1,306 @@
+"""
+Streaming voice conversion over a persistent TCP connection.
+
+Protocol (all integers little-endian):
+  1. The client sends one JSON line, e.g.
+     {"sample_rate": 44100, "speaker": 0, "transpose": 0}
+     An optional "latency_budget_ms" overrides the server's budget for the
+     adaptive quality mode (see QualityController).
+  2. The server answers with one JSON line holding the sample rate it will
+     send back and the algorithmic latency, {"sample_rate": ..., "latency_ms": ...}
+  3. The client streams frames of mono float32 PCM, each prefixed with a
+     uint32 byte count. A zero byte count ends the stream.
+  4. The server sends converted chunks as a uint32 byte count, the
+     end-to-end latency and the compute time of that chunk (two float32,
+     milliseconds), followed by the float32 PCM.
+"""
+import asyncio
+import json
+import logging
+import struct
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+
+from inference import infer_tool
+from resampler import resample_tensor
+from svc_array import F0_METHOD, extract_features, synthesize
+
+logging.getLogger('numba').setLevel(logging.WARNING)
+
+FRAME_HEADER = struct.Struct("<I")
+CHUNK_HEADER = struct.Struct("<Iff")
+
+# (chunk_seconds, context_seconds, f0_method) from best quality to lowest latency
+QUALITY_LEVELS = [
+    (0.5, 0.5, "dio"),
+    (0.5, 0.5, "parselmouth"),
+    (0.5, 0.25, "parselmouth"),
+    (0.35, 0.25, "parselmouth"),
+    (0.25, 0.1, "parselmouth"),
+]
+
+
+class RingBuffer:
+    """Fixed-size float32 ring addressed by absolute sample position."""
+
+    def __init__(self, capacity):
+        self.data = np.zeros(capacity, dtype=np.float32)
+        self.capacity = capacity
+        self.end = 0
+
+    def write(self, samples):
+        n = len(samples)
+        samples = samples[-self.capacity:]
+        self.data.put(np.arange(self.end + n - len(samples), self.end + n), samples, mode="wrap")
+        self.end += n
+
+    def read(self, start, stop):
+        """Samples [start, stop); positions before the stream start read as silence."""
+        lo = max(start, 0)
+        if stop > self.end or lo < min(stop, self.end - self.capacity):
+            raise ValueError(f"[{start}, {stop}) is not buffered (have up to {self.end})")
+        out = np.zeros(stop - start, dtype=np.float32)
+        if lo < stop:
+            out[lo - start:] = self.data.take(np.arange(lo, stop), mode="wrap")
+        return out
+
+
+class StreamConverter:
+    """
+    Converts a live input stream chunk by chunk.
+
+    Every chunk is converted together with context_seconds of already
+    emitted audio before it and lookahead_seconds of audio after it, so the
+    model never sees a hard edge at the chunk boundary. Each conversion
+    produces crossfade_seconds more than the chunk; that tail is blended
+    into the start of the next chunk with sin^2/cos^2 gains (a vectorized
+    overlap-add), which removes the clicks of plain concatenation. Output is
+    emitted at the input sample rate, chunk_seconds + lookahead_seconds
+    behind the input plus the conversion time.
+
+    models.StreamingDecoder is not used here. HuBERT, F0 and the encoder
+    need the whole context window anyway, and the window is cut at the
+    input rate, so its frames do not line up with the previous window's.
+    Feeding the decoder incrementally would also hold back its receptive
+    field on top of the lookahead, about 0.15 s at 44.1 kHz.
+    """
+
+    def __init__(self, svc_model, sr, speaker, tran, chunk_seconds=0.5, context_seconds=0.5,
+                 lookahead_seconds=0.1, crossfade_seconds=0.05, buffer_seconds=10, f0_method=F0_METHOD):
+        if lookahead_seconds < crossfade_seconds:
+            raise ValueError("lookahead_seconds must cover crossfade_seconds")
+        self.svc_model = svc_model
+        self.sr = sr
+        self.speaker = speaker
+        self.tran = tran
+        self.configure(chunk_seconds, context_seconds, f0_method)
+        self.lookahead = int(sr * lookahead_seconds)
+        self.crossfade = int(sr * crossfade_seconds)
+        t = np.linspace(0, np.pi / 2, self.crossfade, endpoint=False, dtype=np.float32)
+        self.fade_in = np.sin(t) ** 2
+        self.fade_out = 1 - self.fade_in
+        self.ring = RingBuffer(int(sr * buffer_seconds))
+        # first input sample not emitted yet, and the crossfade tail for it
+        self.pos = 0
+        self.tail = None
+
+    def configure(self, chunk_seconds, context_seconds, f0_method):
+        """Changes chunk length, context and F0 extractor; applies from the next chunk on."""
+        self.chunk = int(self.sr * chunk_seconds)
+        self.context = int(self.sr * context_seconds)
+        self.f0_method = f0_method
+
+    @property
+    def latency_ms(self):
+        return (self.chunk + self.lookahead) / self.sr * 1000
+
+    def push(self, samples):
+        self.ring.write(np.asarray(samples, dtype=np.float32))
+
+    def ready(self):
+        return self.ring.end >= self.pos + self.chunk + self.lookahead
+
+    def convert(self):
+        """Converts the next chunk; returns chunk samples of float32 output."""
+        start = self.pos - self.context
+        stop = self.pos + self.chunk + self.lookahead
+        wav = self.ring.read(start, stop)
+        feats = extract_features(self.svc_model, wav, self.sr, f0_method=self.f0_method)
+        out_audio, _ = synthesize(self.svc_model, feats, self.speaker, self.tran)
+        out = resample_tensor(out_audio, self.svc_model.target_sample, self.sr).cpu().numpy()
+        out = infer_tool.pad_array(out, stop - start)
+
+        seg = out[self.context:self.context + self.chunk + self.crossfade].copy()
+        if self.tail is not None:
+            seg[:self.crossfade] = self.tail * self.fade_out + seg[:self.crossfade] * self.fade_in
+        self.tail = seg[self.chunk:]
+        self.pos += self.chunk
+        return seg[:self.chunk]
+
+
+class QualityController:
+    """
+    Picks a QUALITY_LEVELS entry that keeps end-to-end latency within budget_ms.
+
+    update is fed the measured latency of every chunk and keeps an
+    exponential moving average of it across level changes. When the average
+    stays above the budget for overload chunks in a row the controller steps
+    one level down, so a single slow chunk does not cost quality. When it
+    stays below upgrade_margin * budget_ms for patience chunks it steps one
+    level up. An upgrade that has to be undone doubles the patience, and the
+    patience only drops back once an upgrade holds for a full patience
+    window, so a level that does not fit is not retried on every other chunk.
+    """
+
+    def __init__(self, budget_ms, levels=QUALITY_LEVELS, smoothing=0.3, upgrade_margin=0.7, patience=8,
+                 overload=3):
+        self.budget_ms = budget_ms
+        self.levels = levels
+        self.smoothing = smoothing
+        self.upgrade_margin = upgrade_margin
+        self.base_patience = patience
+        self.patience = patience
+        self.overload = overload
+        self.level = 0
+        self.average = None
+        self.calm = 0
+        self.over = 0
+        # set by an upgrade until it has held for a patience window or been undone
+        self.upgraded = False
+        self.held = 0
+
+    def settings(self):
+        return self.levels[self.level]
+
+    def update(self, latency_ms):
+        """Records one chunk's latency; returns True when the level changed."""
+        if self.average is None:
+            self.average = latency_ms
+        else:
+            self.average += self.smoothing * (latency_ms - self.average)
+
+        if self.upgraded:
+            self.held += 1
+            if self.held >= self.patience:
+                self.upgraded = False
+                self.patience = self.base_patience
+
+        if self.average > self.budget_ms and self.level < len(self.levels) - 1:
+            self.calm = 0
+            self.over += 1
+            if self.over >= self.overload:
+                if self.upgraded:
+                    self.upgraded = False
+                    self.patience *= 2
+                return self._move(1, "downgrade")
+            return False
+        self.over = 0
+        if self.average < self.upgrade_margin * self.budget_ms and self.level > 0:
+            self.calm += 1
+            if self.calm >= self.patience:
+                return self._move(-1, "upgrade")
+        else:
+            self.calm = 0
+        return False
+
+    def _move(self, step, action):
+        print(f"quality {action}: level {self.level} -> {self.level + step} {self.levels[self.level + step]}, "
+              f"latency {self.average:.1f}ms, budget {self.budget_ms:.1f}ms")
+        self.level += step
+        if step < 0:
+            self.upgraded = True
+            self.held = 0
+        self.calm = 0
+        self.over = 0
+        return True
+
+
+async def handle_client(reader, writer, svc_model, executor, options, latency_budget_ms=0):
+    peer = writer.get_extra_info("peername")
+    handshake = json.loads(await reader.readline())
+    converter = StreamConverter(svc_model, int(handshake["sample_rate"]), handshake.get("speaker", 0),
+                                float(handshake.get("transpose", 0)), **options)
+    latency_budget_ms = float(handshake.get("latency_budget_ms", latency_budget_ms))
+    controller = None
+    if latency_budget_ms > 0:
+        controller = QualityController(latency_budget_ms)
+        converter.configure(*controller.settings())
+    writer.write((json.dumps({"sample_rate": converter.sr, "latency_ms": converter.latency_ms}) + "\n").encode())
+    await writer.drain()
+    print(f"{peer} connected: {handshake}")
+
+    loop = asyncio.get_running_loop()
+    # (absolute end position, arrival time) of every frame still in a pending chunk
+    arrivals = deque()
+    try:
+        while True:
+            (size,) = FRAME_HEADER.unpack(await reader.readexactly(FRAME_HEADER.size))
+            if size == 0:
+                break
+            converter.push(np.frombuffer(await reader.readexactly(size), dtype="<f4"))
+            arrivals.append((converter.ring.end, time.perf_counter()))
+            while converter.ready():
+                while arrivals[0][0] <= converter.pos:
+                    arrivals.popleft()
+                first_arrival = arrivals[0][1]
+                start = time.perf_counter()
+                out = await loop.run_in_executor(executor, converter.convert)
+                now = time.perf_counter()
+                latency_ms = (now - first_arrival) * 1000
+                compute_ms = (now - start) * 1000
+                writer.write(CHUNK_HEADER.pack(out.nbytes, latency_ms, compute_ms) + out.astype("<f4").tobytes())
+                await writer.drain()
+                print(f"{peer} chunk at {converter.pos / converter.sr:.2f}s: "
+                      f"latency {latency_ms:.1f}ms, compute {compute_ms:.1f}ms")
+                if controller is not None and controller.update(latency_ms):
+                    converter.configure(*controller.settings())
+    except asyncio.IncompleteReadError:
+        pass
+    finally:
+        writer.close()
+        print(f"{peer} disconnected")
+
+
+async def serve(svc_model, host, port, options, latency_budget_ms=0):
+    # 模型不是线程安全的，所有连接共用一个推理线程
+    executor = ThreadPoolExecutor(max_workers=1)
+    server = await asyncio.start_server(
+        lambda reader, writer: handle_client(reader, writer, svc_model, executor, options, latency_budget_ms),
+        host, port)
+    print(f"streaming on {host}:{port}")
+    async with server:
+        await server.serve_forever()
+
+
+def main():
+    import argparse
+
+    from inference.infer_tool import Svc
+
+    parser = argparse.ArgumentParser(description='sovits4 streaming server')
+    parser.add_argument('-m', '--model_path', type=str, default="logs/44k/G_0.pth", help='模型路径')
+    parser.add_argument('-c', '--config_path', type=str, default="configs/config.json", help='配置文件路径')
+    parser.add_argument('--host', type=str, default="0.0.0.0", help='监听地址')
+    parser.add_argument('--port', type=int, default=6843, help='监听端口')
+    parser.add_argument('-cs', '--chunk_seconds', type=float, default=0.5, help='每次转换的新音频长度(秒)，越短延迟越低')
+    parser.add_argument('-ctx', '--context_seconds', type=float, default=0.5, help='每块前面附带的已输出音频(秒)，只增加计算量不增加延迟')
+    parser.add_argument('-la', '--lookahead_seconds', type=float, default=0.1, help='每块后面等待的音频(秒)，会计入延迟，不能小于交叉淡化长度')
+    parser.add_argument('-xf', '--crossfade_seconds', type=float, default=0.05, help='相邻块交叉淡化长度(秒)')
+    parser.add_argument('-lb', '--latency_budget_ms', type=float, default=0, help='端到端延迟预算(毫秒)，大于0时按实测延迟自动调整切片长度、上下文长度和F0算法，忽略-cs和-ctx')
+    args = parser.parse_args()
+
+    svc_model = Svc(args.model_path, args.config_path)
+    options = {
+        "chunk_seconds": args.chunk_seconds,
+        "context_seconds": args.context_seconds,
+        "lookahead_seconds": args.lookahead_seconds,
+        "crossfade_seconds": args.crossfade_seconds,
+    }
+    asyncio.run(serve(svc_model, args.host, args.port, options, args.latency_budget_ms))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,18 @@
+"""
+codep/resampler.py for the voicechanger scripts, which run from this
+directory and therefore do not have codep on their import path. The module
+is loaded by file location and its functions re-exported, so both trees use
+the same implementation without touching sys.path.
+"""
+import importlib.util
+import os
+
+_spec = importlib.util.spec_from_file_location(
+    "codep_resampler", os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "resampler.py"))
+_resampler = importlib.util.module_from_spec(_spec)
+_spec.loader.exec_module(_resampler)
+
+poly_filter = _resampler.poly_filter
+resample = _resampler.resample
+resample_tensor = _resampler.resample_tensor
+resample_segment = _resampler.resample_segment
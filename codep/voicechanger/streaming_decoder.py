@@ -0,0 +1,146 @@
+"""
+Incremental decoding for the NSF-HiFiGAN generator (vdecoder.hifigan), kept
+apart from models so it only needs torch. models re-exports both names.
+"""
+import math
+import sys
+
+import torch
+from torch import nn
+from torch.nn import functional as F
+
+
+def decoder_receptive_field(dec):
+    """
+    One-sided receptive field of the NSF-HiFiGAN generator, in input frames.
+
+    Walks conv_pre, every upsampling stage with its resblocks and conv_post,
+    converting each layer's reach from samples at that stage's resolution
+    back to frames. The resblocks of a stage run in parallel, so the widest
+    one bounds the stage.
+    """
+    reach = (dec.conv_pre.kernel_size[0] - 1) // 2 * dec.conv_pre.dilation[0]
+    scale = 1
+    for i, up in enumerate(dec.ups):
+        reach += math.ceil(up.kernel_size[0] / up.stride[0] / 2) / scale
+        scale *= up.stride[0]
+        widest = 0
+        for block in dec.resblocks[i * dec.num_kernels:(i + 1) * dec.num_kernels]:
+            convs = [m for m in block.modules() if isinstance(m, nn.Conv1d)]
+            widest = max(widest, sum((m.kernel_size[0] - 1) // 2 * m.dilation[0] for m in convs))
+        # noise_convs reach one frame of the stage into the harmonic source
+        reach += (widest + 1) / scale
+    reach += (dec.conv_post.kernel_size[0] - 1) // 2 / scale
+    return math.ceil(reach)
+
+
+class StreamingDecoder:
+    """
+    Incremental decoding of SynthesizerTrn latents for real-time use.
+
+    push takes the next frames of decoder input (z and f0 as passed to
+    SynthesizerTrn.dec) and returns the audio that is final so far. The
+    generator is not causal, so the last context_frames of every call are
+    held back until the following call supplies their right-hand context;
+    they are decoded again together with context_frames of already emitted
+    input on the left, and only the new samples are returned. The decoder
+    therefore runs over new frames plus twice the receptive field per call,
+    instead of the whole overlapped window. flush decodes the held-back
+    tail once the stream ends; stream start and end see the same zero
+    padding as an offline decode.
+
+    The generator's layers are driven here rather than through dec.forward,
+    because the NSF harmonic source must not restart per call: its sine
+    phase is carried from one call to the next and the source samples of
+    re-decoded frames are kept, so every call sees exactly the excitation an
+    offline decode of the whole stream would. The random draws (initial
+    overtone phases, then the source noise) happen in the same order as in
+    SineGen, so with the same seed and noise-free voiced input the output
+    matches dec(z, g=g, f0=f0) over the whole stream up to float tolerance.
+    Works on batches; g holds one embedding per batch row.
+    """
+
+    def __init__(self, dec, context_frames=None):
+        # warmup.TracedDecoder keeps the eager generator next to the traced graph
+        self.dec = getattr(dec, "eager", dec)
+        # the slope the generator's own forward uses (LRELU_SLOPE of its module)
+        self.lrelu_slope = sys.modules[type(self.dec).__module__].LRELU_SLOPE
+        self.context = decoder_receptive_field(self.dec) if context_frames is None else context_frames
+        self.hop = math.prod(up.stride[0] for up in self.dec.ups)
+        self.z = None
+        # harmonic source samples of the frames in self.z
+        self.har = None
+        # sine phase (in cycles) after the last source sample, per batch row and overtone
+        self.phase = None
+        # leading frames of self.z whose samples were already returned
+        self.emitted = 0
+
+    def _source(self, f0):
+        """SourceModuleHnNSF for f0 [batch, frames], continuing the phase of the previous call."""
+        source = self.dec.m_source
+        sine_gen = source.l_sin_gen
+        f0 = f0.float().repeat_interleave(self.hop, dim=1).unsqueeze(-1)
+        harmonics = torch.arange(1, sine_gen.dim + 1, device=f0.device)
+        rad = (f0 * harmonics / sine_gen.sampling_rate % 1).double()
+        if self.phase is None:
+            # random start for every overtone, the fundamental starts at 0
+            phase = torch.rand(f0.size(0), sine_gen.dim, device=f0.device)
+            phase[:, 0] = 0
+            self.phase = phase.double()
+        phase = self.phase.unsqueeze(1) + torch.cumsum(rad, dim=1)
+        self.phase = phase[:, -1] % 1
+        sines = torch.sin(2 * math.pi * (phase % 1)).float() * sine_gen.sine_amp
+        uv = (f0 > sine_gen.voiced_threshold).float()
+        noise_amp = uv * sine_gen.noise_std + (1 - uv) * sine_gen.sine_amp / 3
+        sines = sines * uv + noise_amp * torch.randn_like(sines)
+        # l_linear may be quantized (its weight is then a method) or half;
+        # conv_pre is never quantized and has the generator's float dtype
+        sines = sines.to(self.dec.conv_pre.weight.dtype)
+        return source.l_tanh(source.l_linear(sines)).transpose(1, 2)
+
+    def _decode(self, z, har, g):
+        """Generator.forward from conv_pre on, with the harmonic source given."""
+        dec = self.dec
+        x = dec.conv_pre(z)
+        x = x + dec.cond(g)
+        for i, up in enumerate(dec.ups):
+            x = F.leaky_relu(x, self.lrelu_slope)
+            x = up(x)
+            x = x + dec.noise_convs[i](har)
+            xs = None
+            for j in range(dec.num_kernels):
+                if xs is None:
+                    xs = dec.resblocks[i * dec.num_kernels + j](x)
+                else:
+                    xs += dec.resblocks[i * dec.num_kernels + j](x)
+            x = xs / dec.num_kernels
+        x = F.leaky_relu(x)
+        x = dec.conv_post(x)
+        return torch.tanh(x)
+
+    def push(self, z, f0, g):
+        """z [batch, inter_channels, frames], f0 [batch, frames], g as for dec; returns [batch, 1, samples]."""
+        har = self._source(f0)
+        if self.z is not None:
+            z = torch.cat([self.z, z], dim=2)
+            har = torch.cat([self.har, har], dim=2)
+        end = z.size(2) - self.context
+        if end <= self.emitted:
+            self.z, self.har = z, har
+            return z.new_zeros(z.size(0), 1, 0)
+        o = self._decode(z, har, g)[:, :, self.emitted * self.hop:end * self.hop]
+        start = max(end - self.context, 0)
+        self.z, self.har = z[:, :, start:], har[:, :, start * self.hop:]
+        self.emitted = end - start
+        return o
+
+    def flush(self, g):
+        """Decodes the held-back frames at the end of the stream and resets the state."""
+        if self.z is None:
+            return torch.zeros(1, 1, 0)
+        if self.z.size(2) <= self.emitted:
+            o = self.z.new_zeros(self.z.size(0), 1, 0)
+        else:
+            o = self._decode(self.z, self.har, g)[:, :, self.emitted * self.hop:]
+        self.z, self.har, self.phase, self.emitted = None, None, None, 0
+        return o
@@ -0,0 +1,240 @@
+import time
+
+import librosa
+import numpy as np
+import torch
+
+import utils
+from inference import infer_tool
+from inference import slicer
+
+# default F0 extractor; the method is part of the feature cache key
+F0_METHOD = "parselmouth"
+F0_EXTRACTORS = {
+    "parselmouth": utils.compute_f0_parselmouth,
+    "dio": utils.compute_f0_dio,
+}
+
+
+def get_speaker_id(svc_model, speaker):
+    if speaker in svc_model.spk2id:
+        return int(svc_model.spk2id[speaker])
+    return int(speaker)
+
+
+def to_float32_mono(wav):
+    if isinstance(wav, torch.Tensor):
+        wav = wav.detach().cpu().numpy()
+    wav = np.asarray(wav, dtype=np.float32)
+    if wav.ndim == 2:
+        # accept both (samples, channels) and (channels, samples)
+        wav = wav.mean(axis=1 if wav.shape[0] > wav.shape[1] else 0)
+    return wav
+
+
+def content_encoder_id(svc_model):
+    """Identifies the HuBERT/ContentVec that produced a feature: class, checkpoint and precision."""
+    hubert = svc_model.hubert_model
+    return "{}:{}:{}".format(type(hubert).__name__, getattr(hubert, "checkpoint_path", ""),
+                             getattr(hubert, "precision", "fp32"))
+
+
+def extract_features(svc_model, wav, sr, feature_cache=None, f0_method=F0_METHOD):
+    """
+    Speaker- and transpose-independent features of in-memory audio.
+
+    wav is a float32 NumPy array or torch tensor sampled at sr. Returns the
+    content units (already stretched to the F0 frame rate), the untransposed
+    F0 and the voicing flags. These only depend on the audio, so callers that
+    render several speakers or transpose values can compute them once and
+    pass them to synthesize. With a FeatureCache the result is looked up by
+    a hash of the audio, the target rate and the content encoder first and
+    stored after a miss. f0_method picks the
+    F0 extractor from F0_EXTRACTORS.
+    """
+    wav = to_float32_mono(wav)
+    if feature_cache is not None:
+        key = feature_cache.make_key(wav, sr, svc_model.target_sample, svc_model.hop_size, f0_method,
+                                     content_encoder_id(svc_model))
+        feats = feature_cache.get(key, device=svc_model.dev)
+        if feats is not None:
+            return feats
+    # librosa, like resample.py and preprocess_hubert_f0.py, so the features
+    # match what the model was trained on
+    if sr != svc_model.target_sample:
+        wav = librosa.resample(wav, orig_sr=sr, target_sr=svc_model.target_sample)
+    f0 = F0_EXTRACTORS[f0_method](wav, sampling_rate=svc_model.target_sample, hop_length=svc_model.hop_size)
+    f0, uv = utils.interpolate_f0(f0)
+    f0 = torch.FloatTensor(f0).to(svc_model.dev)
+    uv = torch.FloatTensor(uv).to(svc_model.dev)
+
+    wav16k = librosa.resample(wav, orig_sr=svc_model.target_sample, target_sr=16000)
+    wav16k = torch.from_numpy(wav16k).to(svc_model.dev)
+    c = utils.get_hubert_content(svc_model.hubert_model, wav_16k_tensor=wav16k)
+    c = utils.repeat_expand_2d(c.squeeze(0), f0.shape[0])
+    if feature_cache is not None:
+        feature_cache.put(key, (c, f0, uv))
+    return c, f0, uv
+
+
+def apply_features(svc_model, feats, tran, cluster_infer_ratio=0, speaker=None):
+    """Turns extract_features output into the (c, f0, uv) batch Svc.get_unit_f0 returns."""
+    c, f0, uv = feats
+    f0 = (f0 * 2 ** (tran / 12)).unsqueeze(0)
+    uv = uv.unsqueeze(0)
+
+    if cluster_infer_ratio != 0:
+        import cluster
+        cluster_c = cluster.get_cluster_center_result(svc_model.cluster_model, c.cpu().numpy().T, speaker).T
+        cluster_c = torch.FloatTensor(cluster_c).to(svc_model.dev)
+        c = cluster_infer_ratio * cluster_c + (1 - cluster_infer_ratio) * c
+
+    c = c.unsqueeze(0)
+    return c, f0, uv
+
+
+def get_unit_f0_array(svc_model, wav, sr, tran, cluster_infer_ratio=0, speaker=None):
+    """Svc.get_unit_f0 for audio that is already in memory."""
+    return apply_features(svc_model, extract_features(svc_model, wav, sr), tran, cluster_infer_ratio, speaker)
+
+
+def synthesize(svc_model, feats, speaker, tran, cluster_infer_ratio=0, auto_predict_f0=False, noice_scale=0.4,
+               chunk_frames=0):
+    """
+    Runs only the synthesizer on precomputed extract_features output. With
+    chunk_frames, inputs longer than that go through
+    SynthesizerTrn.infer_chunked so memory stays flat; 0 runs them whole.
+    """
+    sid = torch.LongTensor([get_speaker_id(svc_model, speaker)]).to(svc_model.dev).unsqueeze(0)
+    c, f0, uv = apply_features(svc_model, feats, tran, cluster_infer_ratio, speaker)
+    if "half" in svc_model.net_g_path and torch.cuda.is_available():
+        c = c.half()
+    with torch.no_grad():
+        start = time.time()
+        if chunk_frames:
+            audio = svc_model.net_g_ms.infer_chunked(c, f0=f0, g=sid, uv=uv, predict_f0=auto_predict_f0,
+                                                     noice_scale=noice_scale,
+                                                     chunk_frames=chunk_frames)[0, 0].data.float()
+        else:
+            audio = svc_model.net_g_ms.infer(c, f0=f0, g=sid, uv=uv, predict_f0=auto_predict_f0,
+                                             noice_scale=noice_scale)[0, 0].data.float()
+        use_time = time.time() - start
+        print("vits use time:{}".format(use_time))
+    return audio, audio.shape[-1]
+
+
+def synthesize_speakers(svc_model, feats, speakers, tran, cluster_infer_ratio=0, auto_predict_f0=False,
+                        noice_scale=0.4, chunk_frames=0):
+    """
+    synthesize for several speakers at once; returns one audio tensor per
+    speaker. The shared encoder pass runs once through
+    SynthesizerTrn.infer_speakers. The cluster mix changes the content per
+    speaker, so with cluster_infer_ratio set every speaker runs on its own.
+    chunk_frames works as in synthesize.
+    """
+    if cluster_infer_ratio != 0 or len(speakers) == 1:
+        return [synthesize(svc_model, feats, spk, tran, cluster_infer_ratio, auto_predict_f0, noice_scale,
+                           chunk_frames)[0]
+                for spk in speakers]
+    sid = torch.LongTensor([get_speaker_id(svc_model, spk) for spk in speakers]).to(svc_model.dev)
+    c, f0, uv = apply_features(svc_model, feats, tran)
+    if "half" in svc_model.net_g_path and torch.cuda.is_available():
+        c = c.half()
+    with torch.no_grad():
+        start = time.time()
+        if chunk_frames:
+            audio = svc_model.net_g_ms.infer_chunked(c, f0=f0, g=sid, uv=uv, predict_f0=auto_predict_f0,
+                                                     noice_scale=noice_scale, chunk_frames=chunk_frames,
+                                                     speakers=True)[:, 0].data.float()
+        else:
+            audio = svc_model.net_g_ms.infer_speakers(c, f0=f0, g=sid, uv=uv, predict_f0=auto_predict_f0,
+                                                      noice_scale=noice_scale)[:, 0].data.float()
+        use_time = time.time() - start
+        print("vits use time:{} ({} speakers)".format(use_time, len(speakers)))
+    return list(audio)
+
+
+def infer_array(svc_model, speaker, tran, wav, sr, cluster_infer_ratio=0, auto_predict_f0=False, noice_scale=0.4,
+                feature_cache=None, chunk_frames=0):
+    """Svc.infer taking a float32 array plus its sample rate instead of a file."""
+    return synthesize(svc_model, extract_features(svc_model, wav, sr, feature_cache), speaker, tran,
+                      cluster_infer_ratio=cluster_infer_ratio, auto_predict_f0=auto_predict_f0,
+                      noice_scale=noice_scale, chunk_frames=chunk_frames)
+
+
+def extract_slice_features(svc_model, audio_data, audio_sr, pad_seconds=0.5, feature_cache=None):
+    """
+    extract_features for every non-empty (slice_tag, data) slice after the
+    usual silence padding; empty slices map to None.
+    """
+    slice_feats = []
+    for (slice_tag, data) in audio_data:
+        if slice_tag:
+            slice_feats.append(None)
+            continue
+        pad_len = int(audio_sr * pad_seconds)
+        data = np.concatenate([np.zeros([pad_len]), data, np.zeros([pad_len])])
+        slice_feats.append(extract_features(svc_model, data, audio_sr, feature_cache))
+    return slice_feats
+
+
+def slice_array(wav, sr, db_thresh=-40, min_len=5000):
+    """In-memory slicer.cut + slicer.chunks2audio: returns [(slice_tag, data), ...]."""
+    wav = to_float32_mono(wav)
+    chunks = slicer.Slicer(sr=sr, threshold=db_thresh, min_length=min_len).slice(wav)
+    result = []
+    for v in dict(chunks).values():
+        tag = v["split_time"].split(",")
+        if tag[0] != tag[1]:
+            result.append((v["slice"], wav[int(tag[0]):int(tag[1])]))
+    return result
+
+
+def slice_inference_array(svc_model, wav, sr, speaker, tran, slice_db, cluster_infer_ratio, auto_predict_f0,
+                          noice_scale, pad_seconds=0.5, chunk_frames=0):
+    """
+    Svc.slice_inference for audio already in memory; returns a float32 array
+    at target_sample. chunk_frames works as in synthesize.
+    """
+    audio = []
+    for (slice_tag, data) in slice_array(wav, sr, db_thresh=slice_db):
+        length = int(np.ceil(len(data) / sr * svc_model.target_sample))
+        if slice_tag:
+            audio.append(np.zeros(length, dtype=np.float32))
+            continue
+        pad_len = int(sr * pad_seconds)
+        data = np.concatenate([np.zeros([pad_len], dtype=np.float32), data, np.zeros([pad_len], dtype=np.float32)])
+        out_audio, _ = infer_array(svc_model, speaker, tran, data, sr, cluster_infer_ratio=cluster_infer_ratio,
+                                   auto_predict_f0=auto_predict_f0, noice_scale=noice_scale,
+                                   chunk_frames=chunk_frames)
+        _audio = out_audio.cpu().numpy()
+        pad_len = int(svc_model.target_sample * pad_seconds)
+        _audio = _audio[pad_len:_audio.shape[0] - pad_len]
+        audio.append(infer_tool.pad_array(_audio, length))
+    return np.concatenate(audio) if audio else np.zeros(0, dtype=np.float32)
+
+
+class RealTimeVC:
+    """infer_tool.RealTimeVC taking the decoded array instead of a WAV file object."""
+
+    def __init__(self):
+        self.last_chunk = None
+        self.last_o = None
+        self.chunk_len = 16000  # 区块长度
+        self.pre_len = 3840  # 交叉淡化长度，640的倍数
+
+    def process(self, svc_model, speaker_id, f_pitch_change, wav, sr):
+        import maad
+
+        wav = to_float32_mono(wav)
+        if self.last_chunk is not None:
+            wav = np.concatenate([self.last_chunk, wav])
+        audio, _ = infer_array(svc_model, speaker_id, f_pitch_change, wav, sr)
+        audio = audio.cpu().numpy()
+        if self.last_chunk is None:
+            ret = audio[-self.chunk_len:]
+        else:
+            ret = maad.util.crossfade(self.last_o, audio, self.pre_len)[self.chunk_len:2 * self.chunk_len]
+        self.last_chunk = audio[-self.pre_len:]
+        self.last_o = audio
+        return ret
@@ -0,0 +1,115 @@
+import numpy as np
+import torch
+
+from inference import infer_tool
+from svc_array import apply_features, extract_slice_features, get_speaker_id
+
+
+def frame_bytes(hps):
+    """
+    Rough peak memory (bytes) the synthesizer needs per content frame.
+
+    The decoder dominates: after each upsampling stage the channel count
+    halves while the time resolution grows by the stage's rate, and every
+    resblock branch keeps an activation of that size alive.
+    """
+    m = hps.model
+    channels = m.upsample_initial_channel
+    samples = 1
+    peak = channels
+    for rate in m.upsample_rates:
+        channels //= 2
+        samples *= rate
+        peak = max(peak, channels * samples)
+    return peak * (len(m.resblock_kernel_sizes) + 1) * 4
+
+
+def plan_batches(lengths, max_frames):
+    """
+    Groups item indices into batches whose padded size (items * longest item)
+    stays within max_frames. Items are sorted by length first so each batch
+    wastes as little padding as possible; an item longer than the budget
+    still gets a batch of its own.
+    """
+    order = sorted(range(len(lengths)), key=lambda i: lengths[i], reverse=True)
+    batches = []
+    for i in order:
+        if batches and (len(batches[-1]) + 1) * lengths[batches[-1][0]] <= max_frames:
+            batches[-1].append(i)
+        else:
+            batches.append([i])
+    return batches
+
+
+def infer_batch(svc_model, feats, speaker, auto_predict_f0=False, noice_scale=0.4, chunk_frames=0):
+    """
+    Runs several (c, f0, uv) feature sets, as returned by apply_features,
+    through one SynthesizerTrn.infer call. The inputs are zero-padded to the
+    longest one and masked via c_lengths; the returned audio tensors are cut
+    back to each item's own length. speaker is either one speaker for the
+    whole batch or a list with one speaker per item. With chunk_frames, a
+    batch longer than that runs through infer_chunked. Half-precision models
+    get c in half precision, as in Svc.infer.
+    """
+    lengths = [f0.shape[-1] for _, f0, _ in feats]
+    max_len = max(lengths)
+    dev = svc_model.dev
+    c = torch.zeros(len(feats), feats[0][0].shape[1], max_len, device=dev)
+    f0 = torch.zeros(len(feats), max_len, device=dev)
+    uv = torch.zeros(len(feats), max_len, device=dev)
+    for i, (_c, _f0, _uv) in enumerate(feats):
+        c[i, :, :lengths[i]] = _c[0]
+        f0[i, :lengths[i]] = _f0[0]
+        uv[i, :lengths[i]] = _uv[0]
+    if "half" in svc_model.net_g_path and torch.cuda.is_available():
+        c = c.half()
+    c_lengths = torch.LongTensor(lengths).to(dev)
+    speakers = speaker if isinstance(speaker, (list, tuple)) else [speaker] * len(feats)
+    sid = torch.LongTensor([get_speaker_id(svc_model, spk) for spk in speakers]).to(dev).unsqueeze(1)
+    with torch.no_grad():
+        if chunk_frames:
+            audio = svc_model.net_g_ms.infer_chunked(c, f0=f0, g=sid, uv=uv, predict_f0=auto_predict_f0,
+                                                     noice_scale=noice_scale, c_lengths=c_lengths,
+                                                     chunk_frames=chunk_frames)
+        else:
+            audio = svc_model.net_g_ms.infer(c, f0=f0, g=sid, uv=uv, predict_f0=auto_predict_f0,
+                                             noice_scale=noice_scale, c_lengths=c_lengths)
+    return [audio[i, 0, :lengths[i] * svc_model.hop_size].float() for i in range(len(feats))]
+
+
+def infer_slices(svc_model, audio_data, audio_sr, speaker, tran, pad_seconds=0.5, batch_mem_mb=256,
+                 cluster_infer_ratio=0, auto_predict_f0=False, noice_scale=0.4, slice_feats=None, chunk_frames=0):
+    """
+    Batched counterpart of the per-slice loop in inference_main.
+
+    audio_data is the (slice_tag, data) list from slicer.chunks2audio. Every
+    non-empty slice is padded and turned into features, the slices are
+    grouped into padded batches that fit batch_mem_mb, and one numpy array per
+    slice is returned in the original order (silence for empty slices).
+    slice_feats may hold extract_slice_features output reused from an earlier
+    speaker or transpose value. chunk_frames is passed to infer_batch.
+    """
+    max_frames = max(int(batch_mem_mb * 2 ** 20 / frame_bytes(svc_model.hps_ms)), 1)
+    if slice_feats is None:
+        slice_feats = extract_slice_features(svc_model, audio_data, audio_sr, pad_seconds)
+    results = [None] * len(audio_data)
+    todo = []
+    feats = []
+    for i, ((slice_tag, data), slice_feat) in enumerate(zip(audio_data, slice_feats)):
+        length = int(np.ceil(len(data) / audio_sr * svc_model.target_sample))
+        if slice_feat is None:
+            results[i] = np.zeros(length)
+            continue
+        feats.append(apply_features(svc_model, slice_feat, tran, cluster_infer_ratio, speaker))
+        todo.append((i, length))
+
+    pad_len = int(svc_model.target_sample * pad_seconds)
+    for batch in plan_batches([f[1].shape[-1] for f in feats], max_frames):
+        outs = infer_batch(svc_model, [feats[j] for j in batch], speaker, auto_predict_f0, noice_scale, chunk_frames)
+        for j, out_audio in zip(batch, outs):
+            i, length = todo[j]
+            _audio = out_audio.cpu().numpy()
+            _audio = _audio[pad_len:_audio.shape[0] - pad_len]
+            results[i] = infer_tool.pad_array(_audio, length)
+    return results
+
@@ -0,0 +1,105 @@
+import multiprocessing
+
+import numpy as np
+import torch
+
+from inference import infer_tool
+from svc_array import extract_features, synthesize_speakers
+
+# Svc and FeatureCache inherited by the forked workers; set by SvcWorkerPool before forking
+_svc_model = None
+_feature_cache = None
+
+
+def _init_worker(num_threads):
+    torch.set_num_threads(num_threads)
+
+
+def _cache_counts():
+    if _feature_cache is None:
+        return 0, 0, 0
+    return _feature_cache.hits, _feature_cache.misses, _feature_cache.evictions
+
+
+def _convert_slice(item):
+    data, audio_sr, targets, speakers, options = item
+    svc_model = _svc_model
+    counts = _cache_counts()
+    pad_seconds = options["pad_seconds"]
+    length = int(np.ceil(len(data) / audio_sr * svc_model.target_sample))
+    pad_len = int(audio_sr * pad_seconds)
+    data = np.concatenate([np.zeros([pad_len]), data, np.zeros([pad_len])])
+    # the features do not depend on the transpose, every target of the slice reuses them
+    feats = extract_features(svc_model, data, audio_sr, _feature_cache)
+    pad_len = int(svc_model.target_sample * pad_seconds)
+    results = []
+    for key, tran in targets:
+        out_audios = synthesize_speakers(svc_model, feats, speakers, tran,
+                                         cluster_infer_ratio=options["cluster_infer_ratio"],
+                                         auto_predict_f0=options["auto_predict_f0"],
+                                         noice_scale=options["noice_scale"],
+                                         chunk_frames=options["chunk_frames"])
+        outs = []
+        for out_audio in out_audios:
+            _audio = out_audio.cpu().numpy()
+            _audio = _audio[pad_len:_audio.shape[0] - pad_len]
+            outs.append(infer_tool.pad_array(_audio, length).astype(np.float32))
+        results.append((key, outs))
+    # the worker's cache counters die with it, so hand this slice's share to the parent
+    counts = tuple(after - before for after, before in zip(_cache_counts(), counts))
+    return results, counts
+
+
+class SvcWorkerPool:
+    """
+    Process pool that converts slice work items in parallel.
+
+    The synthesizer and HuBERT weights are moved to shared memory and the
+    workers are forked afterwards, so every worker reads the same single
+    copy of the weights instead of loading its own. Each worker limits torch
+    to threads_per_worker intra-op threads so the workers do not
+    oversubscribe the CPU. Needs the fork start method (not available on
+    Windows). With a feature_cache every worker looks features up in (and
+    adds them to) the same cache directory; the workers' hits, misses and
+    evictions are added to feature_cache's counters as results come back.
+    """
+
+    def __init__(self, svc_model, workers, threads_per_worker=1, feature_cache=None):
+        global _svc_model, _feature_cache
+        if "fork" not in multiprocessing.get_all_start_methods():
+            raise RuntimeError("SvcWorkerPool needs the fork start method")
+        for model in (svc_model.net_g_ms, svc_model.hubert_model):
+            model.share_memory()
+        _svc_model = svc_model
+        _feature_cache = feature_cache
+        self.feature_cache = feature_cache
+        ctx = multiprocessing.get_context("fork")
+        self.pool = ctx.Pool(workers, initializer=_init_worker, initargs=(threads_per_worker,))
+
+    def convert(self, items, speakers, pad_seconds=0.5, cluster_infer_ratio=0, auto_predict_f0=False,
+                noice_scale=0.4, chunk_frames=0):
+        """
+        items yields (data, audio_sr, [(key, tran), ...]) for the non-empty
+        slices to convert; a slice's features are extracted once and
+        synthesized for each of its (key, tran) targets. Yields
+        (key, [audio per speaker]) as the workers finish, in any order.
+        """
+        options = {
+            "pad_seconds": pad_seconds,
+            "cluster_infer_ratio": cluster_infer_ratio,
+            "auto_predict_f0": auto_predict_f0,
+            "noice_scale": noice_scale,
+            "chunk_frames": chunk_frames,
+        }
+        jobs = ((data, audio_sr, targets, speakers, options) for data, audio_sr, targets in items)
+        for results, counts in self.pool.imap_unordered(_convert_slice, jobs):
+            if self.feature_cache is not None:
+                self.feature_cache.merge_counts(*counts)
+            yield from results
+
+    def close(self):
+        self.pool.close()
+        self.pool.join()
+        if self.feature_cache is not None:
+            # pick up the entries the workers wrote
+            self.feature_cache.refresh()
@@ -0,0 +1,95 @@
+import os
+
+import pytest
+
+torch = pytest.importorskip("torch")
+np = pytest.importorskip("numpy")
+
+from feature_cache import FeatureCache
+
+
+def make_feats(seed):
+    g = torch.Generator().manual_seed(seed)
+    return torch.randn(1, 16, 20, generator=g), torch.rand(1, 20, generator=g), torch.ones(1, 20)
+
+
+def key(i):
+    return FeatureCache.make_key(np.full(100, i, dtype=np.float32), 44100, 44100, 512, "dio")
+
+
+def entry_size(tmp_path):
+    probe = FeatureCache(str(tmp_path / "probe"))
+    probe.put(key(0), make_feats(0))
+    return probe.total_bytes
+
+
+def test_miss_then_hit(tmp_path):
+    cache = FeatureCache(str(tmp_path))
+    assert cache.get(key(1)) is None
+    feats = make_feats(1)
+    cache.put(key(1), feats)
+    cached = cache.get(key(1))
+    assert all(torch.equal(a, b) for a, b in zip(cached, feats))
+    assert (cache.hits, cache.misses) == (1, 1)
+    assert cache.hit_rate == 0.5
+
+
+def test_key_depends_on_settings():
+    wav = np.zeros(100, dtype=np.float32)
+    assert FeatureCache.make_key(wav, 44100, 44100, 512, "dio") != FeatureCache.make_key(wav, 44100, 44100, 512, "crepe")
+    assert FeatureCache.make_key(wav, 44100, 44100, 512, "dio") != FeatureCache.make_key(wav, 44100, 44100, 512, "dio", "vec768")
+
+
+def test_evicts_least_recently_used_under_the_cap(tmp_path):
+    size = entry_size(tmp_path)
+    cache = FeatureCache(str(tmp_path / "cache"), max_bytes=int(2.5 * size))
+    cache.put(key(1), make_feats(1))
+    cache.put(key(2), make_feats(2))
+    cache.get(key(1))
+    cache.put(key(3), make_feats(3))
+    assert cache.evictions == 1
+    assert cache.total_bytes <= cache.max_bytes
+    assert cache.get(key(2)) is None
+    assert cache.get(key(1)) is not None and cache.get(key(3)) is not None
+    entries = [name for name in os.listdir(cache.cache_dir) if name.endswith(".pt")]
+    assert sorted(entries) == sorted([key(1) + ".pt", key(3) + ".pt"])
+
+
+def test_reopen_keeps_entries_and_recency(tmp_path):
+    size = entry_size(tmp_path)
+    cache_dir = str(tmp_path / "cache")
+    cache = FeatureCache(cache_dir, max_bytes=int(2.5 * size))
+    cache.put(key(1), make_feats(1))
+    cache.put(key(2), make_feats(2))
+    # key(1) was used last before the restart
+    os.utime(cache._path(key(2)), (1000, 1000))
+    os.utime(cache._path(key(1)), (2000, 2000))
+    # a crash mid-put leaves a stray temporary file behind
+    open(os.path.join(cache_dir, "stray.tmp"), "wb").close()
+
+    reopened = FeatureCache(cache_dir, max_bytes=int(2.5 * size))
+    assert reopened.total_bytes == cache.total_bytes
+    assert not os.path.exists(os.path.join(cache_dir, "stray.tmp"))
+    reopened.put(key(3), make_feats(3))
+    assert reopened.get(key(2)) is None
+    assert all(torch.equal(a, b) for a, b in zip(reopened.get(key(1)), make_feats(1)))
+
+
+def test_caches_sharing_a_directory_stay_under_one_cap(tmp_path):
+    # two instances stand in for forked workers, each with its own index
+    size = entry_size(tmp_path)
+    cache_dir = str(tmp_path / "cache")
+    first = FeatureCache(cache_dir, max_bytes=int(2.5 * size))
+    second = FeatureCache(cache_dir, max_bytes=int(2.5 * size))
+    first.put(key(1), make_feats(1))
+    assert second.get(key(1)) is not None
+    for i in range(2, 6):
+        (first if i % 2 else second).put(key(i), make_feats(i))
+    on_disk = [name for name in os.listdir(cache_dir) if name.endswith(".pt")]
+    assert sum(os.path.getsize(os.path.join(cache_dir, name)) for name in on_disk) <= int(2.5 * size)
+
+    first.merge_counts(second.hits, second.misses, second.evictions)
+    first.refresh()
+    assert first.hits == 1
+    assert first.evictions == 3
+    assert len(first.index) == len(on_disk) == 2
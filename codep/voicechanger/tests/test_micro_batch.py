@@ -0,0 +1,29 @@
+import pytest
+
+micro_batch = pytest.importorskip("micro_batch")
+
+
+def test_failing_request_does_not_fail_its_batch(monkeypatch):
+    def extract_features(svc_model, wav, sr, feature_cache):
+        if wav == "broken":
+            raise ValueError("cannot decode")
+        return wav
+
+    batches = []
+
+    def infer_batch(svc_model, feats, speakers, auto_predict_f0, noice_scale):
+        batches.append(feats)
+        return [f + "-out" for f in feats]
+
+    monkeypatch.setattr(micro_batch, "extract_features", extract_features)
+    monkeypatch.setattr(micro_batch, "apply_features", lambda svc_model, feats, tran, speaker: feats)
+    monkeypatch.setattr(micro_batch, "infer_batch", infer_batch)
+
+    batcher = micro_batch.MicroBatcher(object(), window_ms=200)
+    futures = [batcher.submit(wav, 16000, "spk", 0) for wav in ("a", "broken", "b")]
+
+    assert futures[0].result(timeout=5)[0] == "a-out"
+    assert futures[2].result(timeout=5)[0] == "b-out"
+    with pytest.raises(ValueError):
+        futures[1].result(timeout=5)
+    assert batches == [["a", "b"]]
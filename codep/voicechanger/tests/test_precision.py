@@ -0,0 +1,60 @@
+import pytest
+
+torch = pytest.importorskip("torch")
+np = pytest.importorskip("numpy")
+pytest.importorskip("soundfile")
+
+from torch import nn
+
+from precision import PointwiseLinear, log_spectral_distance, pointwise_to_linear, quantize_int8
+
+
+def make_model():
+    return nn.Sequential(
+        nn.utils.weight_norm(nn.Conv1d(8, 16, 1)),
+        nn.ReLU(),
+        nn.Conv1d(16, 16, 3, padding=1),
+        nn.Conv1d(16, 4, 1),
+    )
+
+
+def loaded_models():
+    """Two copies that, like load_checkpoint, only got weight_g/weight_v and never ran forward."""
+    torch.manual_seed(0)
+    state = make_model().state_dict()
+    state["0.weight_g"] = torch.rand_like(state["0.weight_g"]) + 0.5
+    state["0.weight_v"] = torch.randn_like(state["0.weight_v"])
+    models = []
+    for _ in range(2):
+        model = make_model()
+        model.load_state_dict(state)
+        models.append(model.eval())
+    return models
+
+
+def test_pointwise_to_linear_matches_conv_with_weight_norm():
+    reference, converted = loaded_models()
+    pointwise_to_linear(converted)
+    assert isinstance(converted[0], PointwiseLinear)
+    assert isinstance(converted[3], PointwiseLinear)
+    assert isinstance(converted[2], nn.Conv1d)
+    x = torch.randn(2, 8, 50)
+    with torch.no_grad():
+        assert torch.allclose(converted(x), reference(x), atol=1e-5)
+
+
+def test_quantize_int8_stays_close():
+    reference, converted = loaded_models()
+    converted = quantize_int8(converted)
+    x = torch.randn(2, 8, 50)
+    with torch.no_grad():
+        expected = reference(x)
+        error = (converted(x) - expected).abs().max() / expected.abs().max()
+    assert error < 0.05
+
+
+def test_log_spectral_distance():
+    rng = np.random.RandomState(0)
+    audio = rng.randn(16000).astype(np.float32)
+    assert log_spectral_distance(audio, audio) == pytest.approx(0.0, abs=1e-6)
+    assert log_spectral_distance(audio, audio * 0.5) == pytest.approx(20 * np.log10(2), rel=1e-3)
@@ -0,0 +1,80 @@
+import pytest
+
+np = pytest.importorskip("numpy")
+realtime_server = pytest.importorskip("realtime_server")
+
+from realtime_server import QualityController, RingBuffer
+
+LEVELS = ["best", "good", "fast"]
+
+
+def feed(controller, latency_ms, chunks):
+    return [controller.update(latency_ms) for _ in range(chunks)]
+
+
+def test_ring_buffer_reads_back_what_was_written():
+    ring = RingBuffer(8)
+    ring.write(np.arange(5, dtype=np.float32))
+    ring.write(np.arange(5, 11, dtype=np.float32))
+    np.testing.assert_array_equal(ring.read(3, 11), np.arange(3, 11))
+
+
+def test_ring_buffer_reads_silence_before_the_stream_start():
+    ring = RingBuffer(8)
+    ring.write(np.arange(1, 4, dtype=np.float32))
+    np.testing.assert_array_equal(ring.read(-2, 2), [0, 0, 1, 2])
+
+
+def test_ring_buffer_rejects_overwritten_and_future_ranges():
+    ring = RingBuffer(4)
+    ring.write(np.arange(10, dtype=np.float32))
+    with pytest.raises(ValueError):
+        ring.read(5, 8)
+    with pytest.raises(ValueError):
+        ring.read(8, 11)
+    np.testing.assert_array_equal(ring.read(6, 10), [6, 7, 8, 9])
+
+
+def test_ring_buffer_keeps_the_tail_of_an_oversized_write():
+    ring = RingBuffer(4)
+    ring.write(np.arange(6, dtype=np.float32))
+    assert ring.end == 6
+    np.testing.assert_array_equal(ring.read(2, 6), [2, 3, 4, 5])
+
+
+def test_single_slow_chunk_does_not_downgrade():
+    controller = QualityController(100, levels=LEVELS)
+    feed(controller, 50, 5)
+    assert not controller.update(1000)
+    assert controller.level == 0
+
+
+def test_sustained_overload_downgrades_once():
+    controller = QualityController(100, levels=LEVELS, overload=3)
+    assert feed(controller, 150, 3) == [False, False, True]
+    assert controller.level == 1
+    # the faster level brings the average back down before another overload window
+    feed(controller, 40, 3)
+    assert controller.level == 1
+
+
+def test_failed_upgrade_doubles_patience_until_an_upgrade_holds():
+    # smoothing=1 makes the average the last chunk's latency
+    controller = QualityController(100, levels=LEVELS, smoothing=1.0, patience=4, overload=1)
+    controller.update(200)
+    assert controller.level == 1
+    assert feed(controller, 10, 4) == [False, False, False, True]
+    assert controller.level == 0 and controller.upgraded
+
+    # the upgrade does not fit: back down, and the next try waits twice as long
+    controller.update(400)
+    assert controller.level == 1 and controller.patience == 8
+    # an unrelated overload at the lower level keeps the doubled patience
+    controller.update(400)
+    assert controller.level == 2 and controller.patience == 8
+
+    assert feed(controller, 10, 8)[-1] and controller.level == 1
+    assert feed(controller, 10, 8)[-1] and controller.level == 0
+    # the last upgrade held for a full window, so patience is back to normal
+    feed(controller, 10, 8)
+    assert controller.patience == 4 and not controller.upgraded
@@ -0,0 +1,82 @@
+import pytest
+
+torch = pytest.importorskip("torch")
+pytest.importorskip("numpy")
+
+from nsf_generator import Generator
+from precision import quantize_int8
+from streaming_decoder import StreamingDecoder
+
+INTER_CHANNELS = 16
+GIN_CHANNELS = 8
+
+
+def make_generator():
+    torch.manual_seed(0)
+    return Generator(h={
+        "sampling_rate": 16000,
+        "inter_channels": INTER_CHANNELS,
+        "resblock": "1",
+        "resblock_kernel_sizes": [3, 7],
+        "resblock_dilation_sizes": [[1, 3, 5], [1, 3, 5]],
+        "upsample_rates": [4, 4],
+        "upsample_initial_channel": 32,
+        "upsample_kernel_sizes": [8, 8],
+        "gin_channels": GIN_CHANNELS,
+    }).eval()
+
+
+def decode_streaming(dec, z, f0, g, chunk_frames):
+    decoder = StreamingDecoder(dec)
+    outs = [decoder.push(z[:, :, i:i + chunk_frames], f0[:, i:i + chunk_frames], g)
+            for i in range(0, z.size(2), chunk_frames)]
+    outs.append(decoder.flush(g))
+    return torch.cat(outs, dim=2)
+
+
+@pytest.mark.parametrize("chunk_frames", [5, 32, 200])
+def test_matches_offline_decode(chunk_frames):
+    dec = make_generator()
+    # voiced frames with noise_std 0 leave the seeded overtone phases as the only randomness
+    dec.m_source.l_sin_gen.noise_std = 0
+    frames = 150
+    z = torch.randn(1, INTER_CHANNELS, frames)
+    f0 = (200 + 50 * torch.sin(torch.linspace(0, 6, frames))).unsqueeze(0)
+    g = torch.randn(1, GIN_CHANNELS, 1)
+    with torch.no_grad():
+        torch.manual_seed(1)
+        expected = dec(z, f0, g=g)
+        torch.manual_seed(1)
+        actual = decode_streaming(dec, z, f0, g, chunk_frames)
+    assert actual.shape == expected.shape
+    assert torch.allclose(actual, expected, atol=1e-4), (actual - expected).abs().max()
+
+
+def test_batch_and_unvoiced_frames_keep_length():
+    dec = make_generator()
+    frames = 64
+    z = torch.randn(3, INTER_CHANNELS, frames)
+    f0 = torch.full((3, frames), 180.0)
+    f0[:, 20:30] = 0
+    g = torch.randn(3, GIN_CHANNELS, 1)
+    with torch.no_grad():
+        out = decode_streaming(dec, z, f0, g, 9)
+    assert out.shape == (3, 1, frames * 16)
+    assert StreamingDecoder(dec).flush(g).shape == (1, 1, 0)
+
+
+def test_int8_generator_streams():
+    dec = quantize_int8(make_generator())
+    dec.m_source.l_sin_gen.noise_std = 0
+    frames = 80
+    z = torch.randn(1, INTER_CHANNELS, frames)
+    f0 = torch.full((1, frames), 220.0)
+    g = torch.randn(1, GIN_CHANNELS, 1)
+    with torch.no_grad():
+        torch.manual_seed(1)
+        expected = dec(z, f0, g=g)
+        torch.manual_seed(1)
+        actual = decode_streaming(dec, z, f0, g, 16)
+    assert actual.shape == expected.shape
+    # dynamic quantization scales activations per call, so windows differ slightly
+    assert (actual - expected).abs().max() < 1e-2 * expected.abs().max()
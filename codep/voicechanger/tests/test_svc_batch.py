@@ -0,0 +1,65 @@
+from types import SimpleNamespace
+
+import pytest
+
+torch = pytest.importorskip("torch")
+svc_batch = pytest.importorskip("svc_batch")
+
+from svc_batch import infer_batch, plan_batches
+
+
+def test_plan_batches_fits_the_budget():
+    lengths = [30, 100, 10, 60, 55, 20]
+    batches = plan_batches(lengths, 120)
+    assert sorted(i for batch in batches for i in batch) == list(range(len(lengths)))
+    for batch in batches:
+        assert len(batch) * max(lengths[i] for i in batch) <= 120
+    # longest first, so each batch is padded to its first item
+    assert batches[0] == [1]
+    assert [lengths[batch[0]] for batch in batches] == sorted((lengths[b[0]] for b in batches), reverse=True)
+
+
+def test_plan_batches_gives_oversized_items_their_own_batch():
+    assert plan_batches([500, 10, 400], 100) == [[0], [2], [1]]
+
+
+class RecordingNet:
+    """Stands in for SynthesizerTrn: returns each item's f0 repeated hop times."""
+
+    def __init__(self, hop):
+        self.hop = hop
+        self.calls = []
+
+    def infer(self, c, f0, g, uv, predict_f0, noice_scale, c_lengths):
+        self.calls.append(dict(c=c, f0=f0, g=g, uv=uv, c_lengths=c_lengths))
+        return f0.repeat_interleave(self.hop, dim=-1).unsqueeze(1)
+
+
+def make_svc(net_g_path="logs/44k/G_0.pth"):
+    return SimpleNamespace(dev=torch.device("cpu"), net_g_path=net_g_path, spk2id={"a": 0, "b": 3},
+                           hop_size=4, net_g_ms=RecordingNet(4))
+
+
+def make_feats(lengths, channels=8):
+    return [(torch.randn(1, channels, n), torch.full((1, n), float(n)), torch.ones(1, n)) for n in lengths]
+
+
+def test_infer_batch_pads_masks_and_cuts_back():
+    svc = make_svc()
+    outs = infer_batch(svc, make_feats([5, 3, 7]), ["a", "b", 2])
+    call = svc.net_g_ms.calls[0]
+    assert call["c"].shape == (3, 8, 7)
+    assert call["c_lengths"].tolist() == [5, 3, 7]
+    assert call["g"].tolist() == [[0], [3], [2]]
+    assert (call["f0"][1, 3:] == 0).all()
+    assert [out.shape[0] for out in outs] == [20, 12, 28]
+    assert [out[0].item() for out in outs] == [5.0, 3.0, 7.0]
+
+
+@pytest.mark.parametrize("net_g_path, dtype", [("logs/44k/G_0_half.pth", torch.float16),
+                                               ("logs/44k/G_0.pth", torch.float32)])
+def test_infer_batch_casts_content_for_half_models(monkeypatch, net_g_path, dtype):
+    monkeypatch.setattr(torch.cuda, "is_available", lambda: True)
+    svc = make_svc(net_g_path)
+    infer_batch(svc, make_feats([4, 6]), "a")
+    assert svc.net_g_ms.calls[0]["c"].dtype == dtype
@@ -179,7 +179,20 @@ def f0_to_coarse(f0):
   return f0_coarse
 
 
+# set by ModelRegistry: every Svc built afterwards reuses this HuBERT instead of loading its own
+shared_hubert_model = None
+
+
 def get_hubert_model():
+  if shared_hubert_model is not None:
+    return shared_hubert_model
+  # contentvec.py转换后的模型不依赖fairseq，加载快得多
+  from contentvec import CONVERTED_PATH, load_contentvec
+  if os.path.exists(CONVERTED_PATH):
+    print("load model from {}".format(CONVERTED_PATH))
+    model = load_contentvec(CONVERTED_PATH)
+    model.checkpoint_path = CONVERTED_PATH
+    return model
   vec_path = "hubert/checkpoint_best_legacy_500.pt"
   print("load model(s) from {}".format(vec_path))
   from fairseq import checkpoint_utils
@@ -189,6 +202,8 @@ def get_hubert_model():
   )
   model = models[0]
   model.eval()
+  # svc_array.content_encoder_id keys cached features by it
+  model.checkpoint_path = vec_path
   return model
 
 def get_hubert_content(hmodel, wav_16k_tensor):
@@ -217,11 +232,67 @@ def get_content(cmodel, y):
 
 
 
+def torch_load_mmap(checkpoint_path):
+    """
+    torch.load that memory-maps the file where possible (torch >= 2.1 and the
+    zip format), so tensors nobody touches (e.g. optimizer state) are never
+    read into memory. Returns (checkpoint_dict, mmapped).
+    """
+    try:
+        return torch.load(checkpoint_path, map_location='cpu', mmap=True), True
+    except (TypeError, RuntimeError):
+        return torch.load(checkpoint_path, map_location='cpu'), False
+
+
+def fold_weight_norm(model):
+    """Bakes weight_g * weight_v / |weight_v| into a plain weight on every weight-normed layer."""
+    for module in model.modules():
+        if hasattr(module, "weight_g"):
+            torch.nn.utils.remove_weight_norm(module)
+    return model
+
+
+def load_inference_checkpoint(checkpoint_dict, model, mmapped=False):
+    """
+    Loads a save_inference_checkpoint export: weight norm is folded and enc_q
+    dropped on the model first so the state dict matches exactly. When the
+    file is memory-mapped the parameters are assigned rather than copied.
+    """
+    fold_weight_norm(model)
+    if hasattr(model, "enc_q"):
+        del model.enc_q
+    if mmapped:
+        model.load_state_dict(checkpoint_dict['model'], assign=True)
+    else:
+        model.load_state_dict(checkpoint_dict['model'])
+    return model
+
+
+def save_inference_checkpoint(checkpoint_path, model, out_path):
+    """
+    Writes an inference-only copy of a training checkpoint: no optimizer
+    state, no enc_q (only used for training), weight norm folded into the
+    weights. load_checkpoint recognises the result by its inference_only flag.
+    """
+    _, _, learning_rate, iteration = load_checkpoint(checkpoint_path, model, None)
+    fold_weight_norm(model)
+    state_dict = {k: v.contiguous() for k, v in model.state_dict().items() if not k.startswith("enc_q.")}
+    torch.save({'model': state_dict,
+                'iteration': iteration,
+                'learning_rate': learning_rate,
+                'inference_only': True}, out_path)
+    logger.info("Saved inference checkpoint to {} ({} tensors)".format(out_path, len(state_dict)))
+
+
 def load_checkpoint(checkpoint_path, model, optimizer=None, skip_optimizer=False):
     assert os.path.isfile(checkpoint_path)
-    checkpoint_dict = torch.load(checkpoint_path, map_location='cpu')
+    checkpoint_dict, mmapped = torch_load_mmap(checkpoint_path)
     iteration = checkpoint_dict['iteration']
     learning_rate = checkpoint_dict['learning_rate']
+    if checkpoint_dict.get('inference_only', False):
+        load_inference_checkpoint(checkpoint_dict, model, mmapped)
+        logger.info("Loaded inference checkpoint '{}' (iteration {})".format(checkpoint_path, iteration))
+        return model, None, learning_rate, iteration
     if optimizer is not None and not skip_optimizer and checkpoint_dict['optimizer'] is not None:
         optimizer.load_state_dict(checkpoint_dict['optimizer'])
     saved_state_dict = checkpoint_dict['model']
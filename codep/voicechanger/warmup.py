@@ -0,0 +1,148 @@
+import threading
+import time
+
+import numpy as np
+import torch
+from torch import nn
+
+from svc_array import slice_inference_array
+
+
+def dummy_voice(sr, seconds=2.0):
+    """A voiced test signal: five harmonics over a slowly gliding 100-200 Hz F0, plus a little noise."""
+    t = np.arange(int(sr * seconds)) / sr
+    f0 = 150 + 50 * np.sin(2 * np.pi * 0.5 * t)
+    phase = 2 * np.pi * np.cumsum(f0) / sr
+    wav = sum(np.sin(k * phase) / k for k in range(1, 6)) * 0.1
+    wav += np.random.RandomState(0).randn(len(t)) * 0.003
+    return wav.astype(np.float32)
+
+
+class TracedDecoder(nn.Module):
+    """
+    Keeps the dec(x, g=..., f0=...) call signature in front of a traced
+    generator. The eager generator stays reachable as eager, for
+    StreamingDecoder, which drives the generator's layers one by one.
+    """
+
+    def __init__(self, traced, eager):
+        super().__init__()
+        self.traced = traced
+        self.eager = eager
+
+    def forward(self, x, f0, g=None):
+        return self.traced(x, f0, g)
+
+
+def trace_decoder(net_g, hop_size, frames=100):
+    """
+    Replaces net_g.dec with a torch.jit.trace of it, if the trace also holds
+    for a different input length; returns whether it did. The NSF source is
+    random, so the trace is checked by output shape rather than values.
+    """
+    dec = net_g.dec
+    device = next(dec.parameters()).device
+    dtype = next(dec.parameters()).dtype
+
+    def example(n):
+        return (torch.randn(1, net_g.inter_channels, n, device=device, dtype=dtype),
+                torch.full((1, n), 220.0, device=device),
+                torch.randn(1, net_g.gin_channels, 1, device=device, dtype=dtype))
+
+    try:
+        with torch.no_grad():
+            traced = torch.jit.trace(dec, example(frames), check_trace=False)
+            if traced(*example(frames * 2)).shape[-1] != frames * 2 * hop_size:
+                return False
+    except (RuntimeError, TypeError) as e:
+        print(f"decoder trace failed, keeping eager mode: {e}")
+        return False
+    net_g.dec = TracedDecoder(traced, dec)
+    return True
+
+
+def trace_svc(svc_model):
+    """trace_decoder for an Svc; the ONNX backend has no torch decoder to trace."""
+    return isinstance(svc_model.net_g_ms, nn.Module) and trace_decoder(svc_model.net_g_ms, svc_model.hop_size)
+
+
+def warm_up(svc_model, seconds=2.0, min_runs=3, max_runs=10, tolerance=0.2, trace=False):
+    """
+    Runs a dummy voice through the full slice inference path (resampling,
+    HuBERT, F0 extraction, SynthesizerTrn.infer) until latency settles.
+
+    The first calls pay for lazy allocations, kernel selection and JIT
+    compilation. Steady state is reached when the last min_runs latencies
+    all lie within tolerance of their median; after max_runs the warm-up
+    gives up and reports steady=False. With trace the decoder is replaced
+    by a traced graph before the runs.
+    """
+    traced = trace and trace_svc(svc_model)
+    speaker = next(iter(svc_model.spk2id.keys()))
+    wav = dummy_voice(svc_model.target_sample, seconds)
+    latencies = []
+    steady = False
+    while len(latencies) < max_runs:
+        start = time.perf_counter()
+        with torch.no_grad():
+            slice_inference_array(svc_model, wav, svc_model.target_sample, speaker, 0, -40, 0, False, 0.4)
+        latencies.append((time.perf_counter() - start) * 1000)
+        recent = latencies[-min_runs:]
+        if len(recent) == min_runs:
+            median = float(np.median(recent))
+            if all(abs(lat - median) <= tolerance * median for lat in recent):
+                steady = True
+                break
+    report = {
+        "runs": len(latencies),
+        "first_ms": latencies[0],
+        "steady_ms": float(np.median(latencies[-min_runs:])),
+        "steady": steady,
+        "traced": bool(traced),
+    }
+    print(f"warm-up: {report}")
+    return report
+
+
+class WarmUp:
+    """
+    Runs warm_up in a background thread so a server can report readiness meanwhile.
+
+    With trace the decoder is traced and swapped in before the thread
+    starts, so the swap never happens under a request the server is
+    already serving. ready() turns true only once latency settled; if the
+    warm-up fails, error holds the exception, and a warm-up that never
+    settles leaves report["steady"] False.
+    """
+
+    def __init__(self, svc_model, trace=False, **kwargs):
+        self.report = None
+        self.error = None
+        self.traced = bool(trace and trace_svc(svc_model))
+        self.done = threading.Event()
+        self.thread = threading.Thread(target=self._run, args=(svc_model,), kwargs=kwargs, daemon=True)
+        self.thread.start()
+
+    def _run(self, svc_model, **kwargs):
+        try:
+            self.report = warm_up(svc_model, **kwargs)
+            self.report["traced"] = self.traced
+        except Exception as e:
+            print(f"warm-up failed: {e!r}")
+            self.error = e
+        finally:
+            self.done.set()
+
+    def ready(self):
+        return self.done.is_set() and self.report is not None and self.report["steady"]
+
+    def status(self):
+        status = {"ready": self.ready(), "done": self.done.is_set()}
+        if self.error is not None:
+            status["error"] = repr(self.error)
+        if self.report is not None:
+            status.update(self.report)
+        return status
+
+    def wait(self, timeout=None):
+        return self.done.wait(timeout)